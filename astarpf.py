@@ -0,0 +1,159 @@
+import heapq
+from math import sqrt
+import numpy as np
+
+SQRT2 = sqrt(2.)
+# (dx, dy, length) of the eight moves an ant can make.
+MOVES = (
+    (1, 0, 1.), (0, 1, 1.), (-1, 0, 1.), (0, -1, 1.),
+    (1, 1, SQRT2), (-1, 1, SQRT2), (-1, -1, SQRT2), (1, -1, SQRT2)
+)
+
+
+def octile(dx, dy):
+    # Length of the shortest eight-way walk over an open grid.
+    dx, dy = abs(dx), abs(dy)
+    return max(dx, dy) + (SQRT2 - 1.) * min(dx, dy)
+
+
+def slope_cost(heightmap, weight=1.):
+    # AStar step cost: `weight` per unit of height climbed or descended.
+    flat = memoryview(np.ascontiguousarray(heightmap, dtype=np.float64)
+                      .reshape(-1))
+
+    def cost(i, j):
+        return weight * abs(flat[i] - flat[j])
+
+    return cost
+
+
+class AStar:
+    # A* over the walkable cells of a blocked mask, in eight directions.
+    __slots__ = (
+        "width", "height", "blocked", "cost", "search", "seen", "closed",
+        "g", "parent", "expanded"
+    )
+
+    def __init__(self, blocked, cost=None):
+        self.width, self.height = blocked.shape
+        self.blocked = memoryview(blocked.reshape(-1))
+        self.cost = cost
+        n = self.width * self.height
+        self.search = 0
+        self.seen = [0] * n
+        self.closed = [0] * n
+        self.g = [0.] * n
+        self.parent = [-1] * n
+        self.expanded = 0
+
+    def find(self, start, goal):
+        # Cells from start to goal inclusive, or None if unreachable.
+        width, height = self.width, self.height
+        blocked, cost = self.blocked, self.cost
+        seen, closed, g, parent = self.seen, self.closed, self.g, self.parent
+        (sx, sy), (gx, gy) = start, goal
+        if not (0 <= sx < width and 0 <= sy < height):
+            return None
+        if not (0 <= gx < width and 0 <= gy < height):
+            return None
+        s, t = sx * height + sy, gx * height + gy
+        if blocked[s] or blocked[t]:
+            return None
+        self.search += 1
+        search = self.search
+        seen[s], g[s], parent[s] = search, 0., -1
+        heap = [(octile(gx - sx, gy - sy), 0, s)]
+        tie = 1
+        expanded = 0
+        while heap:
+            f, _, i = heapq.heappop(heap)
+            if closed[i] == search:
+                continue
+            closed[i] = search
+            expanded += 1
+            if i == t:
+                self.expanded = expanded
+                return self.trace(t)
+            x, y = divmod(i, height)
+            gi = g[i]
+            for dx, dy, step in MOVES:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                j = nx * height + ny
+                if blocked[j] or closed[j] == search:
+                    continue
+                gj = gi + step
+                if cost is not None:
+                    gj += cost(i, j)
+                if seen[j] != search or gj < g[j]:
+                    seen[j], g[j], parent[j] = search, gj, i
+                    heapq.heappush(
+                        heap, (gj + octile(gx - nx, gy - ny), tie, j)
+                    )
+                    tie += 1
+        self.expanded = expanded
+        return None
+
+    def trace(self, i):
+        path = []
+        height, parent = self.height, self.parent
+        while i >= 0:
+            path.append(divmod(i, height))
+            i = parent[i]
+        path.reverse()
+        return path
+
+    def path_cost(self, path):
+        # Total cost of walking a path this finder returned.
+        height = self.height
+        total = 0.
+        for (x, y), (nx, ny) in zip(path, path[1:]):
+            total += SQRT2 if x != nx and y != ny else 1.
+            if self.cost is not None:
+                total += self.cost(x * height + y, nx * height + ny)
+        return total
+
+
+class PathCache:
+    # Paths found by an AStar, kept until a wall change could alter them.
+
+    def __init__(self, finder):
+        self.finder = finder
+        self.paths = {}
+        self.through = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def get(self, start, goal):
+        key = (start, goal)
+        if key not in self.paths:
+            path = self.finder.find(start, goal)
+            cost = self.finder.path_cost(path) if path else None
+            self.paths[key] = (path, cost)
+            for cell in path or ():
+                self.through.setdefault(cell, set()).add(key)
+        return self.paths[key][0]
+
+    def drop(self, key):
+        path, cost = self.paths.pop(key)
+        for cell in path or ():
+            keys = self.through[cell]
+            keys.discard(key)
+            if not keys:
+                del self.through[cell]
+
+    def wall_changed(self, x, y):
+        finder = self.finder
+        if finder.blocked[x * finder.height + y]:
+            stale = list(self.through.get((x, y), ()))
+        else:
+            stale = [
+                key for key, (path, cost) in self.paths.items()
+                if path is None or
+                octile(x - key[0][0], y - key[0][1]) +
+                octile(key[1][0] - x, key[1][1] - y) < cost
+            ]
+        for key in stale:
+            self.drop(key)
@@ -0,0 +1,269 @@
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+import pypf
+from astarpf import AStar, slope_cost
+from grid import ActiveCells, decay
+from world import World
+
+try:
+    from pypaths import astar as pypaths_astar
+except ImportError:
+    pypaths_astar = None
+
+
+def best_of(fn, repeat):
+    best = None
+    for i in range(repeat):
+        t = time.perf_counter()
+        fn()
+        t = time.perf_counter() - t
+        if best is None or t < best:
+            best = t
+    return best
+
+
+def loop_decay(field, rate):
+    # The per-cell loop World.evaporate/make_path used to run on lists.
+    for x in range(len(field)):
+        for y in range(len(field[x])):
+            if field[x][y]:
+                if field[x][y] >= rate:
+                    field[x][y] -= rate
+                else:
+                    field[x][y] = 0
+
+
+def random_field(size, fill=0.3, seed=1):
+    rng = np.random.default_rng(seed)
+    field = rng.random((size, size), dtype=np.float32)
+    field[rng.random((size, size)) > fill] = 0.
+    return field
+
+
+def bench_decay(args):
+    rate = 0.005
+    print("{0:>6} {1:>14} {2:>14}".format("size", "kernel ms", "loop ms"))
+    for size in args.sizes:
+        pher = random_field(size)
+        home_pher = random_field(size, seed=2)
+        path = random_field(size, seed=3)
+
+        def kernel():
+            decay(pher, rate)
+            decay(home_pher, rate)
+            decay(path, 0.015)
+
+        k = best_of(kernel, args.repeat) * 1000
+        if size <= args.loop_max:
+            lp, lh = pher.tolist(), home_pher.tolist()
+            lpath = path.tolist()
+
+            def loop():
+                loop_decay(lp, rate)
+                loop_decay(lh, rate)
+                loop_decay(lpath, 0.015)
+
+            lo = "{0:14.2f}".format(best_of(loop, 1) * 1000)
+        else:
+            lo = "{0:>14}".format("-")
+        print("{0:>6} {1:14.3f} {2}".format(size, k, lo))
+
+
+def bench_sparse(args):
+    # Trails cover a small fraction of the map; compare dense decay with
+    # active-set decay at that density.
+    rate = 0.005
+    print("{0:>6} {1:>8} {2:>14} {3:>14}".format(
+        "size", "live", "dense ms", "sparse ms"
+    ))
+    for size in args.sizes:
+        field = random_field(size, fill=args.density)
+        # Keep values well above zero so every repeat sees the same cells.
+        field[field > 0] += 1.
+        dense = field.copy()
+        active = ActiveCells(field)
+        d = best_of(lambda: decay(dense, rate), args.repeat) * 1000
+        s = best_of(lambda: active.decay(rate), args.repeat) * 1000
+        print("{0:>6} {1:>8} {2:14.3f} {3:14.3f}".format(
+            size, len(active), d, s
+        ))
+
+
+def bench_ants(args):
+    print("{0:>8} {1:>14} {2:>14}".format("ants", "objects ms", "arrays ms"))
+    for n in args.counts:
+        row = []
+        for vectorized in (False, True):
+            if not vectorized and n > args.object_max:
+                row.append("{0:>14}".format("-"))
+                continue
+            world = World(
+                width=args.size, height=args.size, seed=args.seed,
+                vectorized=vectorized
+            )
+            world.spawn_colony(*world.find_open_cell(
+                world.width // 2, world.height // 2
+            ))
+            colony = world.colonies[0]
+            colony.max_capacity = 0
+            colony.spawn_ants(n, debug=True)
+            t = time.perf_counter()
+            for i in range(args.ticks):
+                colony.update()
+            t = (time.perf_counter() - t) / args.ticks
+            row.append("{0:14.2f}".format(t * 1000))
+        print("{0:>8} {1}".format(n, " ".join(row)))
+
+
+def bench_terrain(args):
+    print("{0:>6} {1:>8} {2:>14}".format("size", "workers", "generate s"))
+    for size in args.sizes:
+        for workers in args.workers:
+            t = best_of(lambda: World(
+                width=size, height=size, seed=args.seed, workers=workers
+            ), args.repeat)
+            print("{0:>6} {1:>8} {2:14.2f}".format(size, workers, t))
+
+
+def bench_astar(args):
+    # pypf and pypaths know nothing of blocked cells, so all three search
+    # the same open heightmap corner to corner.
+    print("{0:>6} {1:>12} {2:>12} {3:>12}".format(
+        "size", "astarpf ms", "pypf ms", "pypaths ms"
+    ))
+    for size in args.sizes:
+        hm = np.random.default_rng(args.seed).random((size, size))
+        start, goal = (0, size - 1), (size - 1, 0)
+        finder = AStar(np.zeros((size, size), dtype=bool), slope_cost(hm))
+        row = [best_of(lambda: finder.find(start, goal), args.repeat)]
+        rows = hm.tolist()
+        if size <= args.loop_max:
+            def old():
+                # get_path reports progress on stdout.
+                with contextlib.redirect_stdout(io.StringIO()):
+                    pypf.get_path(rows, start, goal, rows)
+            row.append(best_of(old, args.repeat))
+        else:
+            row.append(None)
+        if pypaths_astar is not None and size <= args.loop_max:
+            def cost(a, b):
+                return abs(rows[a[0]][a[1]] - rows[b[0]][b[1]])
+            other = pypaths_astar.pathfinder(
+                neighbors=pypaths_astar.grid_neighbors(size, size), cost=cost
+            )
+            row.append(best_of(lambda: other(start, goal), args.repeat))
+        else:
+            row.append(None)
+        print("{0:>6} {1}".format(size, " ".join(
+            "{0:>12}".format("-") if t is None
+            else "{0:12.2f}".format(t * 1000)
+            for t in row
+        )))
+
+
+def bench_walls(args):
+    # Toggle walls next to colonies, where they disturb the most fields.
+    print("{0:>9} {1:>12} {2:>12}".format(
+        "colonies", "rebuild ms", "repair ms"
+    ))
+    rng = np.random.default_rng(args.seed)
+    for n in args.counts:
+        world = World(width=args.size, height=args.size, seed=args.seed)
+        for i in range(n):
+            pos = world.find_open_cell(*rng.integers(0, args.size, 2))
+            if pos:
+                world.spawn_colony(*pos)
+
+        def rebuild():
+            world.colony_field.rebuild()
+            for c in world.colonies:
+                c.flow.rebuild()
+
+        full = best_of(rebuild, args.repeat)
+        cells = []
+        for c in world.colonies[:args.walls]:
+            pos = world.find_open_cell(c.x + 8, c.y + 3)
+            if pos:
+                cells.append(pos)
+        t = time.perf_counter()
+        for x, y in cells * 2:
+            world.build_wall(x, y)
+        t = (time.perf_counter() - t) / max(2 * len(cells), 1)
+        print("{0:>9} {1:12.1f} {2:12.2f}".format(
+            len(world.colonies), full * 1000, t * 1000
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="importANT benchmarks")
+    sub = parser.add_subparsers(dest="bench")
+    sub.required = True
+
+    p = sub.add_parser("decay", help="pheromone and path decay per tick")
+    p.add_argument(
+        "--sizes", type=int, nargs="+", default=[200, 1000, 4000]
+    )
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument(
+        "--loop-max", type=int, default=1000,
+        help="largest size to also time the old per-cell loop on"
+    )
+    p.set_defaults(func=bench_decay)
+
+    p = sub.add_parser("sparse", help="dense vs active-set decay")
+    p.add_argument(
+        "--sizes", type=int, nargs="+", default=[200, 1000, 4000]
+    )
+    p.add_argument("--density", type=float, default=0.005)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_sparse)
+
+    p = sub.add_parser("ants", help="per-tick cost of stepping ants")
+    p.add_argument(
+        "--counts", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    p.add_argument("--size", type=int, default=400)
+    p.add_argument("--ticks", type=int, default=20)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument(
+        "--object-max", type=int, default=10000,
+        help="largest count to also run with Ant objects"
+    )
+    p.set_defaults(func=bench_ants)
+
+    p = sub.add_parser("terrain", help="world generation time")
+    p.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 2000])
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--repeat", type=int, default=1)
+    p.set_defaults(func=bench_terrain)
+
+    p = sub.add_parser("astar", help="A* path search time")
+    p.add_argument("--sizes", type=int, nargs="+", default=[15, 50, 200, 1000])
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument(
+        "--loop-max", type=int, default=50,
+        help="largest size to also time pypf and pypaths on"
+    )
+    p.set_defaults(func=bench_astar)
+
+    p = sub.add_parser("walls", help="field upkeep when walls change")
+    p.add_argument("--counts", type=int, nargs="+", default=[1, 10, 50])
+    p.add_argument("--size", type=int, default=1000)
+    p.add_argument("--walls", type=int, default=20)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--repeat", type=int, default=1)
+    p.set_defaults(func=bench_walls)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
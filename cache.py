@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "importANT")
+# River cells are stored as an (n, 2) array of x, y.
+LAYERS = ("heightmap", "blocked", "color", "river")
+
+
+class WorldCache:
+    # Generated terrain on disk, loaded memory-mapped copy-on-write.
+
+    def __init__(self, root=DEFAULT_DIR):
+        self.root = root
+
+    def path(self, seed, width, height, version):
+        return os.path.join(self.root, "v{0}-{1}-{2}x{3}".format(
+            version, seed, width, height
+        ))
+
+    def load(self, seed, width, height, version):
+        path = self.path(seed, width, height, version)
+        try:
+            layers = {
+                name: np.asarray(np.load(
+                    os.path.join(path, name + ".npy"), mmap_mode="c"
+                ))
+                for name in LAYERS
+            }
+        except (OSError, ValueError):
+            return None
+        if layers["heightmap"].shape != (width, height):
+            return None
+        return layers
+
+    def save(self, seed, width, height, version, layers):
+        path = self.path(seed, width, height, version)
+        if os.path.isdir(path):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        # Write next to the final directory and rename it into place, so
+        # runs sharing the cache never see half-written terrain.
+        tmp = tempfile.mkdtemp(dir=self.root)
+        try:
+            for name in LAYERS:
+                np.save(os.path.join(tmp, name + ".npy"), layers[name])
+            os.rename(tmp, path)
+        except OSError:
+            # Another run saved the same world first.
+            shutil.rmtree(tmp, ignore_errors=True)
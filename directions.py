@@ -0,0 +1,24 @@
+import numpy as np
+
+
+# Directions are indices 0-7 running clockwise from east (y grows
+# downwards), so turning left is -1 and turning right is +1.
+OFFSETS = (
+    (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)
+)
+INDEX = {offset: i for i, offset in enumerate(OFFSETS)}
+LEFT = tuple((i - 1) % 8 for i in range(8))
+RIGHT = tuple((i + 1) % 8 for i in range(8))
+REVERSE = tuple((i + 4) % 8 for i in range(8))
+# Left, forward and right of each direction, as indices and as offsets.
+FRONT = tuple((LEFT[i], i, RIGHT[i]) for i in range(8))
+FRONT_OFFSETS = tuple(tuple(OFFSETS[d] for d in f) for f in FRONT)
+# Keys into Game.symbols.
+GLYPHS = ("horizontal", "diag1", "vertical", "diag2") * 2
+
+# The same tables as arrays, for indexing with arrays of directions.
+DIR_X = np.array([dx for dx, dy in OFFSETS], dtype=np.int64)
+DIR_Y = np.array([dy for dx, dy in OFFSETS], dtype=np.int64)
+LEFT_A = np.array(LEFT, dtype=np.int64)
+RIGHT_A = np.array(RIGHT, dtype=np.int64)
+REVERSE_A = np.array(REVERSE, dtype=np.int64)
@@ -0,0 +1,373 @@
+from collections import deque
+import heapq
+import numpy as np
+from directions import OFFSETS
+
+INF = float("inf")
+# Slack when comparing costs read back from float32 arrays.
+EPS = 1e-3
+# Length of a step in each of OFFSETS.
+STEPS = tuple(2 ** .5 if dx and dy else 1. for dx, dy in OFFSETS)
+
+
+def bfs(blocked, sources, limit=None):
+    # Step count to, and label of, the nearest (x, y, label) source, or -1.
+    width, height = blocked.shape
+    walkable = (~blocked).ravel().tolist()
+    dist = [-1] * (width * height)
+    owner = [-1] * (width * height)
+    queue = deque()
+    for x, y, label in sources:
+        if 0 <= x < width and 0 <= y < height:
+            i = x * height + y
+            if walkable[i] and dist[i] < 0:
+                dist[i] = 0
+                owner[i] = label
+                queue.append(i)
+
+    while queue:
+        i = queue.popleft()
+        d = dist[i] + 1
+        if limit is not None and d > limit:
+            continue
+        x, y = divmod(i, height)
+        label = owner[i]
+        for dx, dy in OFFSETS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                n = nx * height + ny
+                if dist[n] < 0 and walkable[n]:
+                    dist[n] = d
+                    owner[n] = label
+                    queue.append(n)
+
+    shape = (width, height)
+    return (
+        np.array(dist, dtype=np.int32).reshape(shape),
+        np.array(owner, dtype=np.int32).reshape(shape)
+    )
+
+
+def dijkstra(blocked, heightmap, sources, limit=None, slope=1.):
+    # Cost to the nearest source, charging `slope` per unit of height
+    # climbed or descended; inf where not reached.
+    width, height = blocked.shape
+    walkable = (~blocked).ravel().tolist()
+    hm = heightmap.ravel().tolist()
+    dist = [INF] * (width * height)
+    heap = []
+    for x, y in sources:
+        if 0 <= x < width and 0 <= y < height:
+            i = x * height + y
+            if walkable[i] and dist[i]:
+                dist[i] = 0.
+                heap.append((0., i))
+    heapq.heapify(heap)
+    moves = tuple(zip(OFFSETS, STEPS))
+
+    while heap:
+        d, i = heapq.heappop(heap)
+        if d > dist[i]:
+            continue
+        x, y = divmod(i, height)
+        h = hm[i]
+        for (dx, dy), step in moves:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                n = nx * height + ny
+                if not walkable[n]:
+                    continue
+                nd = d + step + slope * abs(hm[n] - h)
+                if nd < dist[n] and (limit is None or nd <= limit):
+                    dist[n] = nd
+                    heapq.heappush(heap, (nd, n))
+
+    return np.array(dist, dtype=np.float32).reshape(width, height)
+
+
+def repair(dist, blocked, x, y, sources, steps=STEPS, heightmap=None,
+           slope=0., limit=None, owner=None, unreached=INF):
+    # Update `dist` (and `owner`) in place after (x, y) was walled or
+    # cleared. Returns the flat indices rewritten.
+    width, height = blocked.shape
+    if not (0 <= x < width and 0 <= y < height):
+        return set()
+    flat = dist.reshape(-1)
+    walls = blocked.reshape(-1)
+    hm = None if heightmap is None else heightmap.reshape(-1)
+    labels = None if owner is None else owner.reshape(-1)
+    moves = tuple(zip(OFFSETS, steps))
+
+    def get(i):
+        d = flat[i]
+        return INF if d == unreached else d.item()
+
+    def put(i, d, label):
+        flat[i] = d
+        if labels is not None:
+            labels[i] = label
+
+    def label_of(i):
+        return -1 if labels is None else labels[i].item()
+
+    def neighbours(i):
+        x, y = divmod(i, height)
+        for (dx, dy), step in moves:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                n = nx * height + ny
+                if not walls[n]:
+                    if hm is not None:
+                        step += slope * abs(hm[n].item() - hm[i].item())
+                    yield n, step
+
+    def in_limit(d):
+        return d < INF and (limit is None or d <= limit)
+
+    c = x * height + y
+    heap = []
+    touched = set()
+    if walls[c]:
+        if get(c) == INF:
+            return touched
+        # Everything downstream of c on a shortest route. Costs are
+        # compared loosely, since float32 storage rounds them.
+        lost = {c}
+        stack = [c]
+        while stack:
+            m = stack.pop()
+            dm = get(m)
+            for n, step in neighbours(m):
+                if n not in lost and abs(get(n) - dm - step) <= EPS:
+                    lost.add(n)
+                    stack.append(n)
+        for i in lost:
+            put(i, unreached, -1)
+        for i in lost:
+            if walls[i]:
+                continue
+            best, label = INF, -1
+            for m, step in neighbours(i):
+                if m not in lost and get(m) + step < best:
+                    best, label = get(m) + step, label_of(m)
+            if in_limit(best):
+                put(i, best, label)
+                heap.append((best, i))
+        touched = lost
+    else:
+        if c in sources:
+            best, label = 0, sources[c]
+        else:
+            best, label = INF, -1
+            for m, step in neighbours(c):
+                if get(m) + step < best:
+                    best, label = get(m) + step, label_of(m)
+        if not in_limit(best) or best + EPS >= get(c):
+            return touched
+        put(c, best, label)
+        heap.append((best, c))
+    heapq.heapify(heap)
+
+    while heap:
+        d, i = heapq.heappop(heap)
+        if d > get(i) + EPS:
+            continue
+        touched.add(i)
+        label = label_of(i)
+        for n, step in neighbours(i):
+            nd = d + step
+            if nd + EPS < get(n) and in_limit(nd):
+                put(n, nd, label)
+                heapq.heappush(heap, (nd, n))
+
+    return touched
+
+
+class ColonyField:
+    # Distance to, and owner of, the nearest hill, rebuilt after
+    # invalidate().
+
+    def __init__(self, world, reach=1, limit=32):
+        self.world = world
+        self.reach = reach
+        self.limit = limit
+        self.colonies = []
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def window(self, sources):
+        w = self.world
+        if self.limit is None:
+            return 0, 0, w.width, w.height
+        if not sources:
+            return 0, 0, 0, 0
+        pad = self.limit
+        x0 = max(min(s[0] for s in sources) - pad, 0)
+        y0 = max(min(s[1] for s in sources) - pad, 0)
+        x1 = min(max(s[0] for s in sources) + pad + 1, w.width)
+        y1 = min(max(s[1] for s in sources) + pad + 1, w.height)
+        return x0, y0, max(x1 - x0, 0), max(y1 - y0, 0)
+
+    def rebuild(self):
+        w = self.world
+        self.colonies = list(w.colonies)
+        sources = []
+        for label, c in enumerate(self.colonies):
+            cells = c.base or {(c.x, c.y)}
+            sources.extend((x, y, label) for x, y in cells)
+        x0, y0, width, height = self.window(sources)
+        self.blocked = w.grid.region(
+            "blocked", x0, y0, width, height, fill=True
+        )
+        self.origin = (x0, y0)
+        self.sources = {
+            (x - x0) * height + y - y0: l for x, y, l in sources
+            if 0 <= x - x0 < width and 0 <= y - y0 < height
+        }
+        self.dist, self.owner = bfs(
+            self.blocked, [(x - x0, y - y0, l) for x, y, l in sources],
+            self.limit
+        )
+        inside = (self.dist >= 0) & (self.dist <= self.reach)
+        self.home = np.where(inside, self.owner, -1).astype(np.int32)
+        self.dirty = False
+
+    def update(self):
+        if self.dirty:
+            self.rebuild()
+
+    def wall_changed(self, x, y):
+        # Repair the cells a wall built or removed at (x, y) affects.
+        if self.dirty:
+            return
+        x -= self.origin[0]
+        y -= self.origin[1]
+        width, height = self.blocked.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return
+        self.blocked[x, y] = self.world.grid.blocked[
+            x + self.origin[0], y + self.origin[1]
+        ]
+        touched = repair(
+            self.dist, self.blocked, x, y, self.sources, steps=(1,) * 8,
+            limit=self.limit, owner=self.owner, unreached=-1
+        )
+        if touched:
+            i = np.fromiter(touched, dtype=np.int64)
+            dist = self.dist.reshape(-1)[i]
+            inside = (dist >= 0) & (dist <= self.reach)
+            self.home.reshape(-1)[i] = np.where(
+                inside, self.owner.reshape(-1)[i], -1
+            )
+
+    def home_at(self, xs, ys):
+        # Colony index at each cell, -1 where no hill is in reach.
+        self.update()
+        xs = np.asarray(xs) - self.origin[0]
+        ys = np.asarray(ys) - self.origin[1]
+        width, height = self.home.shape
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        out = np.full(inside.shape, -1, dtype=np.int32)
+        out[inside] = self.home[xs[inside], ys[inside]]
+        return out
+
+    def colony_at(self, x, y):
+        self.update()
+        x -= self.origin[0]
+        y -= self.origin[1]
+        width, height = self.home.shape
+        if 0 <= x < width and 0 <= y < height:
+            i = self.home[x, y]
+            if i >= 0:
+                return self.colonies[i]
+        return None
+
+
+class FlowField:
+    # Walking cost back to a colony's hill, rebuilt after invalidate().
+
+    def __init__(self, colony, limit=128, slope=10.):
+        self.colony = colony
+        self.limit = limit
+        self.slope = slope
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def rebuild(self):
+        c = self.colony
+        grid = c.world.grid
+        cells = c.base or {(c.x, c.y)}
+        # Every step costs at least 1, so `limit` bounds the window.
+        pad = int(self.limit)
+        x0 = max(min(x for x, y in cells) - pad, 0)
+        y0 = max(min(y for x, y in cells) - pad, 0)
+        x1 = min(max(x for x, y in cells) + pad + 1, grid.width)
+        y1 = min(max(y for x, y in cells) + pad + 1, grid.height)
+        width, height = x1 - x0, y1 - y0
+        self.blocked = grid.region(
+            "blocked", x0, y0, width, height, fill=True
+        )
+        self.hm = grid.region("heightmap", x0, y0, width, height)
+        self.origin = (x0, y0)
+        self.sources = {(x - x0) * height + y - y0: 0 for x, y in cells}
+        self.cost = dijkstra(
+            self.blocked, self.hm, [(x - x0, y - y0) for x, y in cells],
+            self.limit, self.slope
+        )
+        self.dirty = False
+
+    def update(self):
+        if self.dirty:
+            self.rebuild()
+
+    def wall_changed(self, x, y):
+        # Repair the cells a wall built or removed at (x, y) affects.
+        if self.dirty:
+            return
+        x -= self.origin[0]
+        y -= self.origin[1]
+        width, height = self.blocked.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return
+        self.blocked[x, y] = self.colony.world.grid.blocked[
+            x + self.origin[0], y + self.origin[1]
+        ]
+        repair(
+            self.cost, self.blocked, x, y, self.sources,
+            heightmap=self.hm, slope=self.slope, limit=self.limit
+        )
+
+    def cost_at(self, xs, ys):
+        # Cost home from each cell, inf outside the window.
+        self.update()
+        xs = np.asarray(xs) - self.origin[0]
+        ys = np.asarray(ys) - self.origin[1]
+        width, height = self.cost.shape
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        out = np.full(inside.shape, np.inf, dtype=np.float32)
+        out[inside] = self.cost[xs[inside], ys[inside]]
+        return out
+
+    def downhill(self, x, y, cells):
+        # How much closer to home each of `cells` is than (x, y).
+        self.update()
+        x0, y0 = self.origin
+        cost = self.cost
+        width, height = cost.shape
+        x, y = x - x0, y - y0
+        if not (0 <= x < width and 0 <= y < height):
+            return [0.] * len(cells)
+        here = float(cost[x, y])
+        out = []
+        for cx, cy in cells:
+            cx, cy = cx - x0, cy - y0
+            if here < INF and 0 <= cx < width and 0 <= cy < height:
+                there = float(cost[cx, cy])
+                out.append(here - there if there < INF else 0.)
+            else:
+                out.append(0.)
+        return out
@@ -1,5 +1,6 @@
 import math
 import random
+from directions import INDEX, LEFT, OFFSETS, RIGHT
 
 
 def weighted_choice(choices):
@@ -125,39 +126,11 @@ def filled_circle(xc, yc, radius=5):
 
 
 def tiles_in_front(cur_dir):
-    dir_x, dir_y = cur_dir
-    if dir_y == 0:
-        if dir_x == 1:
-            dir_lx, dir_rx = 1, 1
-            dir_ly, dir_ry = -1, 1
-        elif dir_x == 0:
-            dir_lx, dir_rx = -1, 1
-            dir_ly, dir_ry = 0, 0
-        elif dir_x == -1:
-            dir_lx, dir_rx = -1, -1
-            dir_ly, dir_ry = 1, -1
-    elif dir_y == 1:
-        if dir_x == 1:
-            dir_lx, dir_rx = 1, 0
-            dir_ly, dir_ry = 0, 1
-        elif dir_x == 0:
-            dir_lx, dir_rx = 1, -1
-            dir_ly, dir_ry = 1, 1
-        elif dir_x == -1:
-            dir_lx, dir_rx = 0, -1
-            dir_ly, dir_ry = 1, 0
-    elif dir_y == -1:
-        if dir_x == 1:
-            dir_lx, dir_rx = 0, 1
-            dir_ly, dir_ry = -1, 0
-        elif dir_x == 0:
-            dir_lx, dir_rx = -1, 1
-            dir_ly, dir_ry = -1, -1
-        elif dir_x == -1:
-            dir_lx, dir_rx = -1, 0
-            dir_ly, dir_ry = 0, -1
-
-    return (dir_lx, dir_ly), cur_dir, (dir_rx, dir_ry)
+    i = INDEX.get(tuple(cur_dir))
+    if i is None:
+        # Standing still, (0, 0).
+        return (-1, 0), cur_dir, (1, 0)
+    return OFFSETS[LEFT[i]], cur_dir, OFFSETS[RIGHT[i]]
 
 
 def turn(cur_direction, way):
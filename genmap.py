@@ -1,5 +1,6 @@
-from pypf import get_path
+import numpy as np
 from pypaths import astar
+from astarpf import AStar, slope_cost
 
 heightmap = [
     [0.9, 0.9, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
@@ -54,9 +55,10 @@ heightmap = [
 
 
 def make_river(start, end, heightmap):
-    hm = heightmap
-    all_nodes = heightmap
-    return get_path(all_nodes, start, end, heightmap)
+    # Climbs and descents both cost, as in get_cost below.
+    hm = np.array(heightmap, dtype=np.float64)
+    finder = AStar(np.zeros(hm.shape, dtype=bool), slope_cost(hm))
+    return finder.find(start, end)
 
 
 def get_cost(origin, next):
@@ -0,0 +1,375 @@
+import numpy as np
+
+
+# World attribute name -> GridStore layer name, for code that still
+# reaches for the old list-of-lists names.
+LEGACY_LAYERS = dict(
+    blocked_grid="blocked",
+    path_grid="path",
+    pher_grid="pher",
+    home_pher_grid="home_pher",
+    food_grid="food",
+    heightmap="heightmap",
+    color_array="color",
+)
+
+# Layers that only ever decay towards zero between deposits.
+DECAY_LAYERS = ("pher", "home_pher", "path")
+
+
+class GridStore:
+    # Every per-cell layer of a world, as arrays indexed [x, y].
+
+    def __init__(self, width, height, sparse=False):
+        self.width, self.height = width, height
+        shape = (width, height)
+        self.blocked = np.zeros(shape, dtype=bool)
+        self.path = np.zeros(shape, dtype=np.float32)
+        self.pher = np.zeros(shape, dtype=np.float32)
+        self.home_pher = np.zeros(shape, dtype=np.float32)
+        self.heightmap = np.ones(shape, dtype=np.float32)
+        self.color = np.zeros(shape + (3,), dtype=np.uint8)
+        self.food = np.zeros(shape, dtype=bool)
+        self.food_index = FoodIndex(self.food)
+        # In sparse mode decay only visits cells that had a deposit.
+        self.active = {}
+        if sparse:
+            for name in DECAY_LAYERS:
+                self.active[name] = ActiveCells(getattr(self, name))
+
+    def __getitem__(self, name):
+        return getattr(self, LEGACY_LAYERS.get(name, name))
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def mark(self, name, x, y):
+        active = self.active.get(name)
+        if active is not None:
+            active.add(x, y)
+
+    def deposit_many(self, name, xs, ys, amount, cap):
+        # Scatter-add with clamp, same result as depositing one by one.
+        flat = getattr(self, name).reshape(-1)
+        cells, counts = np.unique(xs * self.height + ys, return_counts=True)
+        flat[cells] = np.minimum(flat[cells] + amount * counts, cap)
+        active = self.active.get(name)
+        if active is not None:
+            active.add_cells(cells)
+
+    def wear_many(self, xs, ys, wear, cap=1.):
+        # Each visit wears a cell by `wear` as long as it stays <= cap.
+        flat = self.path.reshape(-1)
+        cells, counts = np.unique(xs * self.height + ys, return_counts=True)
+        values = flat[cells]
+        room = np.floor((cap - values) / wear + 1e-4)
+        counts = np.minimum(counts, np.maximum(room, 0.))
+        flat[cells] = values + wear * counts
+        active = self.active.get("path")
+        if active is not None:
+            active.add_cells(cells[counts > 0])
+
+    def decay_layer(self, name, rate):
+        active = self.active.get(name)
+        if active is None:
+            decay(getattr(self, name), rate)
+        else:
+            active.decay(rate)
+
+    def region(self, name, x, y, width, height, fill=0):
+        # Copy of a window of a layer, with `fill` outside the map.
+        layer = self[name]
+        out = np.full(
+            (width, height) + layer.shape[2:], fill, dtype=layer.dtype
+        )
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        if x0 < x1 and y0 < y1:
+            out[x0 - x:x1 - x, y0 - y:y1 - y] = layer[x0:x1, y0:y1]
+        return out
+
+
+class FoodIndex:
+    # Live food by position, mirrored into the food mask.
+
+    def __init__(self, mask):
+        self.mask = mask
+        self.sources = {}
+
+    def __len__(self):
+        return len(self.sources)
+
+    def __iter__(self):
+        return iter(list(self.sources.values()))
+
+    def __contains__(self, pos):
+        return pos in self.sources
+
+    def get(self, x, y):
+        return self.sources.get((x, y))
+
+    def add(self, food):
+        self.sources[(food.x, food.y)] = food
+        self.mask[food.x, food.y] = True
+        food.index = self
+
+    def remove(self, food):
+        if self.sources.get((food.x, food.y)) is food:
+            del self.sources[(food.x, food.y)]
+            self.mask[food.x, food.y] = False
+        food.index = None
+
+    def in_rect(self, x, y, width, height):
+        for f in self.sources.values():
+            if x <= f.x < x + width and y <= f.y < y + height:
+                yield f
+
+
+class ActiveCells:
+    # The non-zero cells of a decaying layer, as flat indices.
+
+    def __init__(self, field):
+        self.field = field
+        self.flat = field.reshape(-1)
+        self.stride = field.shape[1]
+        self.member = np.zeros(field.size, dtype=bool)
+        self.cells = np.empty(0, dtype=np.intp)
+        self.pending = []
+        self.sync()
+
+    def __len__(self):
+        return len(self.cells) + len(self.pending)
+
+    def sync(self):
+        # Rebuild from the layer, for when it was written to directly.
+        self.pending = []
+        self.cells = np.flatnonzero(self.flat)
+        self.member.fill(False)
+        self.member[self.cells] = True
+
+    def add(self, x, y):
+        i = x * self.stride + y
+        if not self.member[i]:
+            self.member[i] = True
+            self.pending.append(i)
+
+    def add_cells(self, i):
+        # Flat indices, without duplicates.
+        i = i[~self.member[i]]
+        self.member[i] = True
+        self.cells = np.concatenate((self.cells, i))
+
+    def decay(self, rate):
+        if self.pending:
+            self.cells = np.concatenate(
+                (self.cells, np.array(self.pending, dtype=np.intp))
+            )
+            self.pending = []
+        cells = self.cells
+        values = self.flat[cells] - rate
+        np.maximum(values, 0., out=values)
+        self.flat[cells] = values
+        live = values > 0.
+        self.member[cells[~live]] = False
+        self.cells = cells[live]
+
+
+def decay(field, rate):
+    # Subtract and clamp at zero in place, the whole layer in one pass.
+    np.subtract(field, rate, out=field)
+    np.maximum(field, 0., out=field)
+    return field
+
+
+CHUNK_BITS = 6
+CHUNK = 1 << CHUNK_BITS
+# Chunked maps span this many cells on each axis, which no colony will
+# walk across; the world starts out in the middle.
+CHUNKED_SIZE = 1 << 30
+CHUNKS = CHUNKED_SIZE >> CHUNK_BITS
+# Generated on first access, to any cell of the chunk.
+TERRAIN_LAYERS = ("blocked", "heightmap", "color")
+# Allocated on first write; unwritten cells read as zero.
+LAZY_LAYERS = dict(
+    path=np.float32, pher=np.float32, home_pher=np.float32, food=bool
+)
+INTS = (int, np.integer)
+
+
+class ChunkLayer:
+    # One layer of a ChunkedGrid, indexed like a GridStore layer.
+
+    def __init__(self, grid, name, dtype, depth=()):
+        self.grid = grid
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.depth = depth
+        self.zeros = np.zeros((CHUNK, CHUNK) + depth, self.dtype)
+
+    def locate(self, x, y, create=False):
+        # The chunks holding cells (x, y) and each cell's flat index in them.
+        x = np.asarray(x, dtype=np.int64).ravel()
+        y = np.asarray(y, dtype=np.int64).ravel()
+        if len(x) and (
+            x.min() < 0 or y.min() < 0 or
+            x.max() >= CHUNKED_SIZE or y.max() >= CHUNKED_SIZE
+        ):
+            raise IndexError("cell outside the chunked map")
+        keys = (x >> CHUNK_BITS) * CHUNKS + (y >> CHUNK_BITS)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        arrays = [
+            self.grid.array(self.name, k // CHUNKS, k % CHUNKS, create)
+            for k in keys.tolist()
+        ]
+        local = (x & (CHUNK - 1)) * CHUNK + (y & (CHUNK - 1))
+        return arrays, inverse * (CHUNK * CHUNK) + local
+
+    def stack(self, arrays):
+        # One flat array over all the chunks, a view if there is one.
+        if len(arrays) == 1 and arrays[0] is not None:
+            return arrays[0].reshape((-1,) + self.depth)
+        return np.stack([
+            self.zeros if a is None else a for a in arrays
+        ]).reshape((-1,) + self.depth)
+
+    def unstack(self, arrays, flat):
+        # Copy a stack() made from several chunks back into them.
+        if len(arrays) > 1:
+            flat = flat.reshape((len(arrays), CHUNK, CHUNK) + self.depth)
+            for a, part in zip(arrays, flat):
+                a[...] = part
+
+    def cell(self, x, y, create=False):
+        if not (0 <= x < CHUNKED_SIZE and 0 <= y < CHUNKED_SIZE):
+            raise IndexError("cell outside the chunked map")
+        return self.grid.array(
+            self.name, x >> CHUNK_BITS, y >> CHUNK_BITS, create
+        )
+
+    def __getitem__(self, key):
+        x, y = key
+        if isinstance(x, INTS) and isinstance(y, INTS):
+            a = self.cell(x, y)
+            if a is None:
+                return self.dtype.type(0)
+            return a[x & (CHUNK - 1), y & (CHUNK - 1)]
+        if isinstance(x, slice) or isinstance(y, slice):
+            raise TypeError("chunked layers take coordinates, not slices")
+        shape = np.broadcast(np.asarray(x), np.asarray(y)).shape
+        x, y = np.broadcast_arrays(x, y)
+        arrays, cells = self.locate(x, y)
+        if not len(cells):
+            return np.zeros(shape + self.depth, self.dtype)
+        return self.stack(arrays)[cells].reshape(shape + self.depth)
+
+    def __setitem__(self, key, value):
+        x, y = key
+        if isinstance(x, INTS) and isinstance(y, INTS):
+            a = self.cell(x, y, create=True)
+            a[x & (CHUNK - 1), y & (CHUNK - 1)] = value
+            return
+        if isinstance(x, slice) or isinstance(y, slice):
+            raise TypeError("chunked layers take coordinates, not slices")
+        x, y = np.broadcast_arrays(x, y)
+        arrays, cells = self.locate(x, y, create=True)
+        if not len(cells):
+            return
+        flat = self.stack(arrays)
+        flat[cells] = np.broadcast_to(
+            np.asarray(value, self.dtype), x.shape + self.depth
+        ).reshape((-1,) + self.depth)
+        self.unstack(arrays, flat)
+
+
+class ChunkedGrid:
+    # GridStore layers in CHUNK x CHUNK chunks made when first touched.
+
+    def __init__(self, generate):
+        self.width = self.height = CHUNKED_SIZE
+        self.generate = generate
+        self.chunks = {}
+        self.blocked = ChunkLayer(self, "blocked", bool)
+        self.heightmap = ChunkLayer(self, "heightmap", np.float32)
+        self.color = ChunkLayer(self, "color", np.uint8, (3,))
+        for name, dtype in LAZY_LAYERS.items():
+            setattr(self, name, ChunkLayer(self, name, dtype))
+        self.food_index = FoodIndex(self.food)
+
+    def __getitem__(self, name):
+        return getattr(self, LEGACY_LAYERS.get(name, name))
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = self.generate(cx, cy)
+        return chunk
+
+    def array(self, name, cx, cy, create=False):
+        # The chunk's array for a layer; None for an unallocated lazy
+        # layer unless `create`.
+        chunk = self.chunk(cx, cy)
+        a = chunk.get(name)
+        if a is None and create:
+            a = chunk[name] = np.zeros((CHUNK, CHUNK), LAZY_LAYERS[name])
+        return a
+
+    def lazy_chunks(self, name):
+        for key, chunk in self.chunks.items():
+            a = chunk.get(name)
+            if a is not None:
+                yield key, a
+
+    def mark(self, name, x, y):
+        pass
+
+    def deposit_many(self, name, xs, ys, amount, cap):
+        layer = self[name]
+        arrays, cells = layer.locate(xs, ys, create=True)
+        flat = layer.stack(arrays)
+        cells, counts = np.unique(cells, return_counts=True)
+        flat[cells] = np.minimum(flat[cells] + amount * counts, cap)
+        layer.unstack(arrays, flat)
+
+    def wear_many(self, xs, ys, wear, cap=1.):
+        arrays, cells = self.path.locate(xs, ys, create=True)
+        flat = self.path.stack(arrays)
+        cells, counts = np.unique(cells, return_counts=True)
+        values = flat[cells]
+        room = np.floor((cap - values) / wear + 1e-4)
+        counts = np.minimum(counts, np.maximum(room, 0.))
+        flat[cells] = values + wear * counts
+        self.path.unstack(arrays, flat)
+
+    def decay_layer(self, name, rate):
+        for key, a in list(self.lazy_chunks(name)):
+            decay(a, rate)
+            if not a.any():
+                del self.chunks[key][name]
+
+    def region(self, name, x, y, width, height, fill=0):
+        layer = self[name]
+        out = np.full((width, height) + layer.depth, fill, layer.dtype)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return out
+        for cx in range(x0 >> CHUNK_BITS, ((x1 - 1) >> CHUNK_BITS) + 1):
+            for cy in range(y0 >> CHUNK_BITS, ((y1 - 1) >> CHUNK_BITS) + 1):
+                # The part of the window this chunk covers.
+                ax, ay = max(x0, cx * CHUNK), max(y0, cy * CHUNK)
+                bx = min(x1, (cx + 1) * CHUNK)
+                by = min(y1, (cy + 1) * CHUNK)
+                a = self.array(name, cx, cy)
+                dst = out[ax - x:bx - x, ay - y:by - y]
+                if a is None:
+                    dst[...] = 0
+                else:
+                    dst[...] = a[
+                        ax - cx * CHUNK:bx - cx * CHUNK,
+                        ay - cy * CHUNK:by - cy * CHUNK
+                    ]
+        return out
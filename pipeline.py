@@ -0,0 +1,141 @@
+import threading
+import time
+import numpy as np
+
+# Grid layers a snapshot copies from under the window.
+LAYERS = ("color", "path", "pher", "heightmap")
+
+
+class Snapshot:
+    # Everything the view draws, copied out of the world at one tick.
+
+    def __init__(self):
+        self.grid = None
+        self.origin = None
+        self.timer = -1
+
+    def capture(self, world, x, y, width, height):
+        grid = world.grid
+        # Kept so a regenerated world, which gets a new grid, is noticed.
+        self.grid = grid
+        self.origin = (x, y)
+        self.timer = world.timer
+        self.seed = world.seed
+        self.layers = {
+            name: grid.region(name, x, y, width, height) for name in LAYERS
+        }
+        self.noise = world.path_noise.region(x, y, width, height)
+        self.walls = [
+            (wx, wy) for wx, wy in world.walls
+            if 0 <= wx - x < width and 0 <= wy - y < height
+        ]
+        self.food = [
+            (f.x, f.y) for f in grid.food_index.in_rect(x, y, width, height)
+        ]
+        route = None
+        if world.route_start is not None:
+            route = world.route_home(world.route_start)
+        self.route = [
+            (rx, ry) for rx, ry in route or ()
+            if 0 <= rx - x < width and 0 <= ry - y < height
+        ]
+        xs, ys, dirs = [], [], []
+        for c in world.colonies:
+            if c.vectorized:
+                n = c.ants.count
+                ax, ay, ad = c.ants.x[:n], c.ants.y[:n], c.ants.dir[:n]
+            else:
+                ax = np.array([a.x for a in c.ants], dtype=np.int64)
+                ay = np.array([a.y for a in c.ants], dtype=np.int64)
+                ad = np.array([a.dir for a in c.ants], dtype=np.int8)
+            seen = (
+                (ax >= x) & (ax < x + width) & (ay >= y) & (ay < y + height)
+            )
+            xs.append(ax[seen])
+            ys.append(ay[seen])
+            dirs.append(ad[seen])
+        self.ants = (
+            np.concatenate(xs).tolist() if xs else [],
+            np.concatenate(ys).tolist() if ys else [],
+            np.concatenate(dirs).tolist() if dirs else []
+        )
+        self.hills = [
+            (tuple(c.base), tuple(c.mid), tuple(c.top))
+            for c in world.colonies
+        ]
+        self.colonies = len(world.colonies)
+        self.ant_count = sum(len(c.ants) for c in world.colonies)
+        self.food_count = sum(c.food for c in world.colonies)
+
+
+class SnapshotBuffer:
+    # Two snapshots, one being written while the other is drawn.
+
+    def __init__(self):
+        self.front, self.back = Snapshot(), Snapshot()
+        self.cond = threading.Condition()
+        self.reading = None
+
+    def capture(self, world, x, y, width, height):
+        with self.cond:
+            while self.reading is self.back:
+                self.cond.wait()
+        self.back.capture(world, x, y, width, height)
+        with self.cond:
+            self.front, self.back = self.back, self.front
+
+    def acquire(self):
+        with self.cond:
+            self.reading = self.front
+            return self.reading
+
+    def release(self):
+        with self.cond:
+            self.reading = None
+            self.cond.notify_all()
+
+
+class SimWorker:
+    # Ticks the world on its own thread and captures snapshots.
+
+    def __init__(self, world, scheduler, buffer, window):
+        self.world = world
+        self.scheduler = scheduler
+        self.buffer = buffer
+        self.window = window
+        self.lock = threading.RLock()
+        self.paused = False
+        self.stale = True
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def step(self):
+        # One round of ticking and capturing; returns the ticks run.
+        with self.lock:
+            if self.paused:
+                self.scheduler.hold()
+                done = 0
+            else:
+                done = self.scheduler.advance()
+            window = self.window()
+            if done or self.stale or window[:2] != self.buffer.front.origin:
+                self.stale = False
+                self.buffer.capture(self.world, *window)
+        return done
+
+    def run(self):
+        while self.running:
+            if not self.step():
+                # Nothing owed yet: wait for about a tick.
+                time.sleep(min(1. / self.scheduler.rate, 0.01))
@@ -0,0 +1,278 @@
+import numpy as np
+from directions import (
+    DIR_X, DIR_Y, GLYPHS, LEFT_A, OFFSETS, REVERSE_A, RIGHT_A
+)
+
+FIELDS = dict(
+    x=np.int64,
+    y=np.int64,
+    dir=np.int8,
+    mode=np.int8,       # 0: search, 1: home
+    energy=np.int32,
+    food=np.int32,
+    trail_len=np.int32,
+    trail_head=np.int32,
+)
+
+
+class AntView:
+    # Read-only view of one ant in an AntPopulation, shaped like Ant.
+    __slots__ = ("x", "y", "dir", "direction", "mode", "energy", "food")
+
+    def __init__(self, pop, i):
+        self.x, self.y = int(pop.x[i]), int(pop.y[i])
+        self.dir = int(pop.dir[i])
+        self.direction = OFFSETS[self.dir]
+        self.mode = int(pop.mode[i])
+        self.energy = int(pop.energy[i])
+        self.food = int(pop.food[i])
+
+    def get_symbol(self, symbol):
+        return symbol[GLYPHS[self.dir]]
+
+
+class AntPopulation:
+    # A colony's ants as parallel arrays, all sensing the grid as it was at
+    # the start of the tick.
+
+    def __init__(self, colony, capacity=64):
+        self.colony = colony
+        self.world = colony.world
+        self.max_energy = 600
+        self.carry = 2
+        self.trail_cap = self.max_energy // 2
+        self.count = 0
+        self.rng = colony.rng.generator
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        for name, dtype in FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.trail = np.zeros((capacity, self.trail_cap), dtype=np.int8)
+
+    def _grow(self, need):
+        capacity = self.capacity
+        while capacity < need:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        old = {name: getattr(self, name) for name in FIELDS}
+        old_trail, n = self.trail, self.count
+        self._alloc(capacity)
+        for name in FIELDS:
+            getattr(self, name)[:n] = old[name][:n]
+        self.trail[:n] = old_trail[:n]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield AntView(self, i)
+
+    def spawn(self, n=1):
+        start = self.count
+        self._grow(start + n)
+        end = start + n
+        self.x[start:end] = self.colony.x
+        self.y[start:end] = self.colony.y
+        self.dir[start:end] = self.rng.integers(0, 8, n)
+        self.mode[start:end] = 0
+        self.energy[start:end] = self.max_energy
+        self.food[start:end] = 0
+        self.trail_len[start:end] = 0
+        self.trail_head[start:end] = 0
+        self.count = end
+
+    def remove(self, idx):
+        # Swap-remove: live ants from the tail move into the freed slots,
+        # so the cost follows the number of deaths, not the population.
+        n = self.count
+        k = len(idx)
+        if not k:
+            return
+        end = n - k
+        holes = idx[idx < end]
+        tail = np.arange(end, n)
+        dead_tail = idx[idx >= end] - end
+        keep = np.ones(k, dtype=bool)
+        keep[dead_tail] = False
+        tail = tail[keep]
+        for name in FIELDS:
+            a = getattr(self, name)
+            a[holes] = a[tail]
+        self.trail[holes] = self.trail[tail]
+        self.count = end
+
+    def trail_cells(self, idx):
+        # Walk each trail back from the ant's position, newest step first.
+        lens = self.trail_len[idx]
+        if not len(idx) or not lens.any():
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        cap = self.trail_cap
+        back = np.arange(cap)
+        slots = (self.trail_head[idx][:, None] - 1 - back) % cap
+        steps = self.trail[idx[:, None], slots]
+        valid = back < lens[:, None]
+        ox = np.where(valid, DIR_X[steps], 0)
+        oy = np.where(valid, DIR_Y[steps], 0)
+        # Cell j is the position minus the first j steps.
+        sx = np.cumsum(ox, axis=1) - ox
+        sy = np.cumsum(oy, axis=1) - oy
+        xs = self.x[idx][:, None] - sx
+        ys = self.y[idx][:, None] - sy
+        return xs[valid], ys[valid]
+
+    def refill(self, idx):
+        w = self.world
+        amount = w.parameters["pher_amount_refill"]
+        xs, ys = self.trail_cells(idx)
+        if len(xs):
+            w.home_pheromones(xs, ys, amount)
+        search = idx[self.mode[idx] == 0]
+        xs, ys = self.trail_cells(search)
+        if len(xs):
+            w.search_pheromones(xs, ys, amount)
+
+    def take_food(self, idx):
+        # Ants sharing a food cell take one unit each while it lasts.
+        grid = self.world.grid
+        cells = self.x[idx] * grid.height + self.y[idx]
+        order = np.argsort(cells, kind="stable")
+        cells = cells[order]
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        ends = np.r_[starts[1:], len(cells)]
+        took = []
+        for s, e in zip(starts, ends):
+            cx, cy = divmod(int(cells[s]), grid.height)
+            source = grid.food_index.get(cx, cy)
+            if source is None:
+                continue
+            got = source.take(int(e - s))
+            took.append(order[s:s + got])
+        if not took:
+            return idx[:0]
+        return idx[np.concatenate(took)]
+
+    def in_colony(self, xs, ys):
+        return self.world.colony_field.home_at(xs, ys) >= 0
+
+    def step(self):
+        n = self.count
+        if not n:
+            return
+        x, y, d = self.x[:n], self.y[:n], self.dir[:n]
+        mode, energy, food = self.mode[:n], self.energy[:n], self.food[:n]
+        trail_len = self.trail_len[:n]
+        grid = self.world.grid
+
+        searching = mode == 0
+        homing = ~searching
+        tired = searching & (energy <= self.max_energy // 2)
+        mode[tired] = 1
+        trail_len[tired] = 0
+
+        moving = np.ones(n, dtype=bool)
+        hungry = searching & (food < self.carry)
+        on_food = np.flatnonzero(hungry & grid.food[x, y])
+        if len(on_food):
+            took = self.take_food(on_food)
+            food[took] += 1
+            energy[took] += 50
+            moving[took] = False
+
+        full = np.flatnonzero(searching & ~hungry)
+        if len(full):
+            self.refill(full)
+            trail_len[full] = 0
+            d[full] = REVERSE_A[d[full]]
+            mode[full] = 1
+
+        idx = np.flatnonzero(homing)
+        if len(idx):
+            idx = idx[self.in_colony(x[idx], y[idx])]
+        if len(idx):
+            self.colony.food += int(food[idx].sum())
+            self.refill(idx)
+            food[idx] = 0
+            mode[idx] = 0
+            trail_len[idx] = 0
+            d[idx] = REVERSE_A[d[idx]]
+            energy[idx] = self.max_energy
+
+        energy[energy > 0] -= 1
+        self.move(np.flatnonzero(moving))
+        self.remove(np.flatnonzero(energy <= 0))
+
+    def move(self, idx):
+        if not len(idx):
+            return
+        w = self.world
+        grid = w.grid
+        params = w.parameters
+        k = len(idx)
+        x0, y0, d0 = self.x[idx], self.y[idx], self.dir[idx].astype(np.int64)
+        searching = self.mode[idx] == 0
+
+        # Left, forward and right candidates as rows.
+        cand = np.stack((LEFT_A[d0], d0, RIGHT_A[d0]))
+        cx = x0 + DIR_X[cand]
+        cy = y0 + DIR_Y[cand]
+        inside = (cx >= 0) & (cx < grid.width) & (cy >= 0) & (cy < grid.height)
+        cx = np.clip(cx, 0, grid.width - 1)
+        cy = np.clip(cy, 0, grid.height - 1)
+
+        weights = np.zeros((3, k), dtype=np.float32)
+        weights[1] = 0.1
+        hm = grid.heightmap
+        weights += 1 - np.abs(hm[x0, y0] - hm[cx, cy])
+        pher = np.where(searching, grid.pher[cx, cy], grid.home_pher[cx, cy])
+        weights += pher * params["pher_sensitivity"]
+        weights += searching & grid.food[cx, cy]
+        flow_weight = params["flow_weight"]
+        if flow_weight and not searching.all():
+            flow = self.colony.flow
+            here = flow.cost_at(x0, y0)
+            there = flow.cost_at(cx, cy)
+            reach = np.isfinite(here) & np.isfinite(there) & ~searching
+            gain = np.zeros(there.shape, dtype=np.float32)
+            np.subtract(here, there, out=gain, where=reach)
+            weights += flow_weight * gain
+        weights[~inside] = 0.
+        np.maximum(weights, 0., out=weights)
+
+        lw, fw, rw = weights
+        pick = np.ones(k, dtype=np.int64)
+        pick[lw > np.maximum(fw, rw)] = 0
+        pick[rw > np.maximum(fw, lw)] = 2
+        rand = self.rng.integers(0, params["rand_dir_chance"] + 1, k) == 0
+        side = np.where(self.rng.random(k) < 0.5, 2, 0)
+        pick[rand] = side[rand]
+        new_dir = cand[pick, np.arange(k)]
+        self.dir[idx] = new_dir
+
+        nx = x0 + DIR_X[new_dir]
+        ny = y0 + DIR_Y[new_dir]
+        ok = (nx >= 0) & (nx < grid.width) & (ny >= 0) & (ny < grid.height)
+        ok[ok] = ~grid.blocked[nx[ok], ny[ok]]
+        idx, nx, ny = idx[ok], nx[ok], ny[ok]
+        new_dir, searching = new_dir[ok], searching[ok]
+        if not len(idx):
+            return
+        self.x[idx], self.y[idx] = nx, ny
+
+        amount = params["pher_amount_walk"]
+        w.wear_paths(nx, ny)
+        if searching.any():
+            w.search_pheromones(nx[searching], ny[searching], amount)
+        if not searching.all():
+            homing = ~searching
+            w.home_pheromones(nx[homing], ny[homing], amount)
+
+        head = self.trail_head[idx]
+        self.trail[idx, head] = new_dir
+        self.trail_head[idx] = (head + 1) % self.trail_cap
+        self.trail_len[idx] = np.minimum(
+            self.trail_len[idx] + 1, self.trail_cap
+        )
@@ -8,7 +8,7 @@
 # May 2011
 
 import random
-from math import sqrt, cos, sin, atan2
+from math import atan2, ceil, cos, floor, sin, sqrt
 
 
 def dist(p1, p2):
@@ -60,24 +60,105 @@ def grid_line(p0, p1):
     return points
 
 
+class NodeGrid:
+    # Points bucketed on a square grid for nearest-point queries.
+
+    def __init__(self, cell):
+        self.cell = float(cell)
+        self.points = []
+        self.buckets = {}
+        self.lo = self.hi = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def bucket(self, p):
+        return int(floor(p[0] / self.cell)), int(floor(p[1] / self.cell))
+
+    def add(self, p):
+        bx, by = self.bucket(p)
+        self.buckets.setdefault((bx, by), []).append(len(self.points))
+        self.points.append(p)
+        if self.lo is None:
+            self.lo, self.hi = [bx, by], [bx, by]
+        else:
+            self.lo = [min(self.lo[0], bx), min(self.lo[1], by)]
+            self.hi = [max(self.hi[0], bx), max(self.hi[1], by)]
+
+    def ring(self, bx, by, r):
+        # Occupied buckets r steps (Chebyshev) from bucket (bx, by).
+        x0, x1 = max(bx - r, self.lo[0]), min(bx + r, self.hi[0])
+        y0, y1 = max(by - r, self.lo[1]), min(by + r, self.hi[1])
+        if 2 * (x1 - x0 + y1 - y0) > len(self.buckets):
+            # Fewer occupied buckets than ring cells to look up.
+            for (x, y), b in self.buckets.items():
+                if max(abs(x - bx), abs(y - by)) == r:
+                    yield b
+            return
+        for x in range(x0, x1 + 1):
+            if abs(x - bx) == r:
+                ys = range(y0, y1 + 1)
+            else:
+                ys = [y for y in (by - r, by + r) if y0 <= y <= y1]
+            for y in ys:
+                b = self.buckets.get((x, y))
+                if b:
+                    yield b
+
+    def nearest(self, p):
+        # The closest point, the earliest added on ties, or None.
+        if not self.points:
+            return None
+        bx, by = self.bucket(p)
+        # Rings that cannot reach the occupied buckets are skipped.
+        start = max(
+            self.lo[0] - bx, bx - self.hi[0], self.lo[1] - by, by - self.hi[1],
+            0
+        )
+        end = max(
+            abs(bx - self.lo[0]), abs(bx - self.hi[0]),
+            abs(by - self.lo[1]), abs(by - self.hi[1])
+        )
+        best, best_d = None, None
+        for r in range(start, end + 1):
+            for b in self.ring(bx, by, r):
+                for i in b:
+                    d = dist(self.points[i], p)
+                    if best is None or (d, i) < (best_d, best):
+                        best, best_d = i, d
+            # Anything in a farther ring is at least r cells away.
+            if best is not None and best_d < r * self.cell:
+                break
+        return self.points[best]
+
+    def any_within(self, p, radius):
+        bx, by = self.bucket(p)
+        r = int(ceil(radius / self.cell))
+        for x in range(bx - r, bx + r + 1):
+            for y in range(by - r, by + r + 1):
+                for i in self.buckets.get((x, y), ()):
+                    if dist(self.points[i], p) <= radius:
+                        return True
+        return False
+
+
 def gen_river(
-    xdim, ydim, epsilon=6.0, numnodes=10, startnode=(0.0, 0.0), custom_nodes=[]
+    xdim, ydim, epsilon=6.0, numnodes=10, startnode=(0.0, 0.0),
+    custom_nodes=(), rng=random
 ):
-    nodes = [startnode]
+    # Cells of a random tree grown from startnode in steps of epsilon.
+    # Buckets about as wide as the mean spacing of the finished tree.
+    nodes = NodeGrid(max(epsilon * 2, sqrt(xdim * ydim / max(numnodes, 1))))
+    nodes.add(startnode)
     points = set()
-    custom_count = len(custom_nodes)
-    for i in range(numnodes - custom_count):
-        if len(custom_nodes):
-            rand = custom_nodes[0]
-            custom_nodes.pop(0)
+    for i in range(numnodes - len(custom_nodes)):
+        if i < len(custom_nodes):
+            rand = custom_nodes[i]
         else:
-            rand = random.uniform(0, xdim), random.uniform(0, ydim)
-        nn = nodes[0]
-        for p in nodes:
-            if dist(p, rand) < dist(nn, rand):
-                nn = p
+            rand = rng.uniform(0, xdim), rng.uniform(0, ydim)
+        nn = nodes.nearest(rand)
         newnode = step_from_to(nn, rand, epsilon)
-        nodes.append(newnode)
+        nodes.add(newnode)
         nn_g = int(nn[0]), int(nn[1])
         newn_g = int(newnode[0]), int(newnode[1])
 
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class RandomStream:
+    # Scalar draws served from blocks of uniforms generated in bulk.
+
+    def __init__(self, seed=None, block=4096, seed_seq=None):
+        if seed_seq is None:
+            seed_seq = np.random.SeedSequence(seed)
+        self.seed_seq = seed_seq
+        self.generator = np.random.Generator(np.random.PCG64(seed_seq))
+        self.block = block
+        self.buffer = []
+        self.pos = 0
+
+    def spawn(self):
+        return RandomStream(
+            block=self.block, seed_seq=self.seed_seq.spawn(1)[0]
+        )
+
+    def refill(self):
+        self.buffer = self.generator.random(self.block).tolist()
+        self.pos = 0
+
+    def random(self):
+        if self.pos >= len(self.buffer):
+            self.refill()
+        v = self.buffer[self.pos]
+        self.pos += 1
+        return v
+
+    def randbelow(self, n):
+        return int(self.random() * n)
+
+    def randrange(self, n):
+        return self.randbelow(n)
+
+    def randint(self, a, b):
+        return a + self.randbelow(b - a + 1)
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def choice(self, seq):
+        return seq[self.randbelow(len(seq))]
+
+    def shuffle(self, seq):
+        self.generator.shuffle(seq)
@@ -0,0 +1,158 @@
+import argparse
+import random
+import time
+
+from cache import DEFAULT_DIR, WorldCache
+from world import World
+
+
+def populate(world, colonies, food, seed):
+    rnd = random.Random(seed)
+    x, y, width, height = world.spawn_area
+    for i in range(colonies):
+        pos = world.find_open_cell(
+            x + rnd.randrange(width), y + rnd.randrange(height)
+        )
+        if pos:
+            world.spawn_colony(*pos)
+    for i in range(food):
+        pos = world.find_open_cell(
+            x + rnd.randrange(width), y + rnd.randrange(height)
+        )
+        if pos:
+            world.spawn_food(*pos)
+
+
+def make_cache(args):
+    if args.no_cache:
+        return None
+    return WorldCache(args.cache)
+
+
+def world_options(args):
+    return dict(
+        width=args.width, height=args.height, seed=args.seed,
+        sparse=args.sparse, vectorized=args.vectorized,
+        workers=args.workers, cache=make_cache(args), chunked=args.chunked
+    )
+
+
+def run_headless(args):
+    ticks = 1000 if args.ticks is None else args.ticks
+    t = time.perf_counter()
+    world = World(**world_options(args))
+    world.parameters["flow_weight"] = args.flow
+    populate(world, args.colonies, args.food, world.seed)
+    gen_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for i in range(ticks):
+        world.update()
+    run_time = time.perf_counter() - t
+
+    ants = sum(len(c.ants) for c in world.colonies)
+    food = sum(c.food for c in world.colonies)
+    if world.chunked:
+        print("Seed: {0} (chunked, {1} chunks made)".format(
+            world.seed, len(world.grid.chunks)
+        ))
+    else:
+        print("Seed: {0} ({1}x{2})".format(
+            world.seed, world.width, world.height
+        ))
+    print("Generated in {0:.2f}s".format(gen_time))
+    print("Ticks: {0} in {1:.2f}s ({2:.1f} ticks/s)".format(
+        ticks, run_time, ticks / run_time if run_time else 0.
+    ))
+    print("Colonies: {0} Ants: {1} Food: {2}".format(
+        len(world.colonies), ants, food
+    ))
+
+
+def run_window(args):
+    from main import Game
+    g = Game(
+        threaded=args.threaded, budget=args.budget / 1000.,
+        **world_options(args)
+    )
+    g.world.parameters["flow_weight"] = args.flow
+    g.scheduler.rate = args.rate
+    g.scheduler.fast = args.fast
+    populate(g.world, args.colonies, args.food, g.world.seed)
+    g.sim.stale = True
+    g.start()
+    while not args.ticks or g.scheduler.ticks < args.ticks:
+        g.update(0)
+        g.render(0)
+    g.sim.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an importANT world")
+    parser.add_argument(
+        "--ticks", type=int, default=None,
+        help="ticks to run (default: 1000 headless, unbounded in the window)"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--width", type=int, default=200)
+    parser.add_argument("--height", type=int, default=200)
+    parser.add_argument("--colonies", type=int, default=1)
+    parser.add_argument("--food", type=int, default=10)
+    parser.add_argument(
+        "--sparse", action="store_true",
+        help="decay only cells that have been deposited on"
+    )
+    parser.add_argument(
+        "--vectorized", action="store_true",
+        help="step each colony's ants as one array-backed population"
+    )
+    parser.add_argument(
+        "--flow", type=float, default=0.,
+        help="how strongly homing ants follow their colony's flow field"
+    )
+    parser.add_argument(
+        "--chunked", action="store_true",
+        help="unbounded map generated in chunks as it is explored; "
+        "--width and --height set the starting area"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="processes generating terrain tiles (default: all CPUs)"
+    )
+    parser.add_argument(
+        "--cache", default=DEFAULT_DIR,
+        help="directory of generated worlds to reuse (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="always generate terrain, and don't store it"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=15.,
+        help="simulation ticks per second in the window"
+    )
+    parser.add_argument(
+        "--fast", action="store_true",
+        help="fast-forward: tick as much as each frame allows"
+    )
+    parser.add_argument(
+        "--budget", type=float, default=50.,
+        help="most milliseconds of ticking per frame (default: %(default)g)"
+    )
+    parser.add_argument(
+        "--threaded", action="store_true",
+        help="simulate on a worker thread while frames are drawn"
+    )
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="run the simulation without tdl and report ticks/second"
+    )
+    args = parser.parse_args()
+    if args.headless:
+        run_headless(args)
+    else:
+        run_window(args)
+
+
+if __name__ == "__main__":
+    main()
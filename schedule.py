@@ -0,0 +1,45 @@
+import time
+
+
+class Scheduler:
+    # Ticks at `rate` per second, spending at most `budget` per frame.
+
+    def __init__(self, tick, rate=15., budget=0.05, clock=time.perf_counter):
+        self.tick = tick
+        self.rate = rate
+        self.budget = budget
+        self.fast = False
+        self.clock = clock
+        self.last = None
+        self.owed = 0.
+        self.ticks = 0
+
+    def hold(self):
+        # Paused: time passing now is not owed later.
+        self.last = None
+        self.owed = 0.
+
+    def advance(self):
+        now = self.clock()
+        if self.last is not None and not self.fast:
+            self.owed += (now - self.last) * self.rate
+        self.last = now
+        owed = float("inf") if self.fast else int(self.owed)
+        done = 0
+        while done < owed:
+            self.tick()
+            done += 1
+            if self.clock() - now >= self.budget:
+                break
+        if self.fast or done < owed:
+            self.owed = 0.
+        else:
+            self.owed -= done
+        self.ticks += done
+        return done
+
+    def faster(self, factor=2.):
+        self.rate *= factor
+
+    def slower(self, factor=2.):
+        self.rate = max(self.rate / factor, 1.)
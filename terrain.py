@@ -0,0 +1,400 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Tables and constants from the noise package's C sources, so the array
+# versions below give the same values as noise.pnoise3 and noise.snoise2.
+_P = (
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225,
+    140, 36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247,
+    120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57,
+    177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175, 74,
+    165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122, 60,
+    211, 133, 230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65,
+    25, 63, 161, 1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200,
+    196, 135, 130, 116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64,
+    52, 217, 226, 250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212,
+    207, 206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213,
+    119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9,
+    129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178, 185, 112, 104,
+    218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144, 12, 191, 179, 162,
+    241, 81, 51, 145, 235, 249, 14, 239, 107, 49, 192, 214, 31, 181, 199, 106,
+    157, 184, 84, 204, 176, 115, 121, 50, 45, 127, 4, 150, 254, 138, 236, 205,
+    93, 222, 114, 67, 29, 24, 72, 243, 141, 128, 195, 78, 66, 215, 61, 156,
+    180
+)
+PERM = np.array(_P * 2, dtype=np.int32)
+GRAD3 = np.array([
+    (1, 1, 0), (-1, 1, 0), (1, -1, 0), (-1, -1, 0),
+    (1, 0, 1), (-1, 0, 1), (1, 0, -1), (-1, 0, -1),
+    (0, 1, 1), (0, -1, 1), (0, 1, -1), (0, -1, -1),
+    (1, 0, -1), (-1, 0, -1), (0, -1, 1), (0, 1, 1)
+], dtype=np.float32)
+GX, GY, GZ = GRAD3.T.copy()
+F2 = np.float32(0.3660254037844386)
+G2 = np.float32(0.21132486540518713)
+
+# Maps with fewer cells than this are generated in-process; below it a
+# process pool costs more to start than it saves.
+PARALLEL_MIN = 512 * 512
+TILE = 256
+
+f32 = np.float32
+
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+def _lerp(t, a, b):
+    return a + t * (b - a)
+
+
+def _grad3(h, x, y, z):
+    h = h & 15
+    return x * GX[h] + y * GY[h] + z * GZ[h]
+
+
+def _perlin3(x, y, z, rx, ry, rz):
+    i = np.floor(np.fmod(x, f32(rx))).astype(np.int32)
+    j = np.floor(np.fmod(y, f32(ry))).astype(np.int32)
+    k = np.floor(np.fmod(z, f32(rz))).astype(np.int32)
+    ii = np.fmod((i + 1).astype(np.float32), f32(rx)).astype(np.int32) & 255
+    jj = np.fmod((j + 1).astype(np.float32), f32(ry)).astype(np.int32) & 255
+    kk = np.fmod((k + 1).astype(np.float32), f32(rz)).astype(np.int32) & 255
+    i, j, k = i & 255, j & 255, k & 255
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    z = z - np.floor(z)
+    fx, fy, fz = _fade(x), _fade(y), _fade(z)
+    a, b = PERM[i], PERM[ii]
+    aa, ab = PERM[a + j], PERM[a + jj]
+    ba, bb = PERM[b + j], PERM[b + jj]
+    x1, y1, z1 = x - 1, y - 1, z - 1
+    return _lerp(
+        fz,
+        _lerp(
+            fy,
+            _lerp(fx, _grad3(PERM[aa + k], x, y, z),
+                  _grad3(PERM[ba + k], x1, y, z)),
+            _lerp(fx, _grad3(PERM[ab + k], x, y1, z),
+                  _grad3(PERM[bb + k], x1, y1, z))
+        ),
+        _lerp(
+            fy,
+            _lerp(fx, _grad3(PERM[aa + kk], x, y, z1),
+                  _grad3(PERM[ba + kk], x1, y, z1)),
+            _lerp(fx, _grad3(PERM[ab + kk], x, y1, z1),
+                  _grad3(PERM[bb + kk], x1, y1, z1))
+        )
+    )
+
+
+def pnoise3(x, y, z, octaves=1, persistence=0.5, lacunarity=2.,
+            repeat=1024):
+    # noise.pnoise3 over broadcast arrays, as float32.
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    z = np.asarray(z, dtype=np.float32)
+    if octaves == 1:
+        return _perlin3(x, y, z, repeat, repeat, repeat)
+    freq, amp, mx, total = f32(1), f32(1), f32(0), f32(0)
+    for i in range(octaves):
+        r = int(repeat * freq)
+        n = _perlin3(x * freq, y * freq, z * freq, r, r, r)
+        total = total + n * amp
+        mx += amp
+        freq *= f32(lacunarity)
+        amp *= f32(persistence)
+    return total / mx
+
+
+def _simplex2(x, y):
+    s = (x + y) * F2
+    i = np.floor(x + s)
+    j = np.floor(y + s)
+    t = (i + j) * G2
+    x0 = x - (i - t)
+    y0 = y - (j - t)
+    i1 = (x0 > y0).astype(np.int32)
+    j1 = 1 - i1
+    x1 = x0 - i1.astype(np.float32) + G2
+    y1 = y0 - j1.astype(np.float32) + G2
+    x2 = x0 + G2 * f32(2) - f32(1)
+    y2 = y0 + G2 * f32(2) - f32(1)
+    ii = i.astype(np.int32) & 255
+    jj = j.astype(np.int32) & 255
+    total = np.zeros(np.broadcast(x, y).shape, dtype=np.float32)
+    corners = (
+        (x0, y0, PERM[ii + PERM[jj]]),
+        (x1, y1, PERM[ii + i1 + PERM[jj + j1]]),
+        (x2, y2, PERM[ii + 1 + PERM[jj + 1]])
+    )
+    for cx, cy, h in corners:
+        h = h % 12
+        f = f32(0.5) - cx * cx - cy * cy
+        n = f * f * f * f * (GX[h] * cx + GY[h] * cy)
+        total += np.where(f > 0, n, f32(0))
+    return total * f32(70)
+
+
+def snoise2(x, y, octaves=1, persistence=0.5, lacunarity=2., base=0.):
+    # noise.snoise2 over arrays, float32 like pnoise3.
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    z = f32(base)
+    total = _simplex2(x + z, y + z)
+    freq, amp, mx = f32(1), f32(1), f32(1)
+    for i in range(1, octaves):
+        freq *= f32(lacunarity)
+        amp *= f32(persistence)
+        mx += amp
+        total = total + _simplex2(x * freq + z, y * freq + z) * amp
+    return total / mx
+
+
+def shade(rgb, light):
+    # functions.shade_color for an array of lights, giving uint8 colors.
+    light = np.asarray(light, dtype=np.float64)[..., None]
+    c = np.asarray(rgb, dtype=np.float64)
+    c = np.where(light > 1, c + (255 - c) * (light - 1), c * light)
+    return np.clip(c, 0, 255).astype(np.uint8)
+
+
+def blend(old, new, alpha):
+    # functions.alpha_blend_color for an array of old colors.
+    old = np.asarray(old, dtype=np.float64)
+    new = np.asarray(new, dtype=np.float64)
+    return (alpha * new + (1 - alpha) * old).astype(np.uint8)
+
+
+def coords(x0, y0, w, h, freq):
+    # Noise coordinates of a tile as a column and a row, to broadcast.
+    xs = (np.arange(x0, x0 + w) / freq).astype(np.float32)
+    ys = (np.arange(y0, y0 + h) / freq).astype(np.float32)
+    return xs[:, None], ys[None, :]
+
+
+def heightmap_tile(seed, x0, y0, w, h):
+    x, y = coords(x0, y0, w, h, 32.)
+    n = pnoise3(x, y, seed, octaves=2).astype(np.float64)
+    return (n * 10 + 3).astype(np.float32)
+
+
+# Shading of grass by height, highest band first. Cells below every
+# band keep their color.
+GRASS_BANDS = (
+    (7., 1.4), (6., 1.3), (5., 1.2), (4., 1.1), (3., 1.),
+    (2.5, 0.9), (2., 0.8), (1.5, 0.7)
+)
+
+
+def surface_tile(seed, grass_freq, heightmap, rippled, x0, y0):
+    # Colors and blocked cells of one tile, from its carved heightmap.
+    w, h = heightmap.shape
+    n = heightmap
+
+    # Grass, lightened on high ground and darkened on low ground.
+    x, y = coords(x0, y0, w, h, grass_freq)
+    value = (snoise2(x, y).astype(np.float64) + 8) / 8
+    color = shade((75, 200, 15), value)
+    conds = [n >= t for t, light in GRASS_BANDS] + [n > 1.]
+    lights = [light for t, light in GRASS_BANDS] + [0.6]
+    color = shade(color, np.select(conds, lights, 1.))
+
+    # Puddles.
+    x, y = coords(x0, y0, w, h, 4)
+    ripple = snoise2(x, y).astype(np.float64)
+    water = ((ripple + 8) / 8 + 1) / 2
+    deep = n <= 0.2
+    shallow = ~deep & (n <= 0.5)
+    edge = ~deep & ~shallow & (n < 0.7)
+    mud = (n >= 0.7) & (n < 1)
+    for cells, rgb in (
+        (deep, (20, 110, 140)), (shallow, (30, 120, 170)),
+        (edge, (100, 165, 205))
+    ):
+        color[cells] = shade(rgb, water[cells])
+    color[mud] = blend(color[mud], (100, 75, 60), 0.7)
+    blocked = n < 0.7
+
+    # Rocks, on the cells puddles left open.
+    x, y = coords(x0, y0, w, h, 16.)
+    rock = pnoise3(x, y, seed * 3).astype(np.float64) * 8 + 4
+    rock[blocked] = np.inf
+    peak = rock <= 0.1
+    light = np.where(rippled[peak], (ripple[peak] + 2) / 2, 1.)
+    color[peak] = shade((120, 120, 120), light)
+    color[~peak & (rock <= 0.3)] = 110
+    color[(rock > 0.3) & (rock <= 0.5)] = 100
+    color[(rock > 0.5) & (rock < 0.8)] = 90
+    blocked |= rock < 0.8
+    return color, blocked
+
+
+# Banks of a river: every cell at offset (+-d or 0, +-d or 0) from a
+# river cell has its height multiplied by the factor, once per such
+# river cell.
+RIVER_STENCILS = ((3, 0.8), (2, 0.8), (1, 0.6))
+
+
+def shifted_add(count, mask, dx, dy):
+    # count[x, y] += mask[x - dx, y - dy] wherever both are on the map.
+    w, h = mask.shape
+    count[max(dx, 0):w + min(dx, 0), max(dy, 0):h + min(dy, 0)] += mask[
+        max(-dx, 0):w - max(dx, 0), max(-dy, 0):h - max(dy, 0)
+    ]
+
+
+def carve_river(hm, cells):
+    # Sink river cells to zero and lower the land around them, in place.
+    w, h = hm.shape
+    cells = cells[
+        (cells[:, 0] >= 0) & (cells[:, 0] < w) &
+        (cells[:, 1] >= 0) & (cells[:, 1] < h)
+    ]
+    if not len(cells):
+        return
+    # Only the river's bounding box, grown by the widest stencil, changes.
+    pad = max(d for d, f in RIVER_STENCILS)
+    x0, y0 = np.maximum(cells.min(axis=0) - pad, 0)
+    x1, y1 = np.minimum(cells.max(axis=0) + pad + 1, (w, h))
+    hm = hm[x0:x1, y0:y1]
+    w, h = hm.shape
+    river = np.zeros((w, h), dtype=np.int32)
+    river[cells[:, 0] - x0, cells[:, 1] - y0] = 1
+    factor = np.ones((w, h))
+    count = np.empty((w, h), dtype=np.int32)
+    for d, f in RIVER_STENCILS:
+        count.fill(0)
+        for dx in (-d, 0, d):
+            for dy in (-d, 0, d):
+                if dx or dy:
+                    shifted_add(count, river, dx, dy)
+        factor *= f ** count
+    banks = (hm > 0) & (factor < 1)
+    hm[banks] *= factor[banks]
+    hm[river > 0] = 0.
+
+
+# Steps the path shading noise and wear are quantized to.
+NOISE_LEVELS = 32
+WEAR_LEVELS = 64
+
+
+def path_noise(x0, y0, w, h, levels=NOISE_LEVELS):
+    # The noise worn paths are shaded with, as levels 0 to levels - 1.
+    x, y = coords(x0, y0, w, h, 2.)
+    n = snoise2(x, y).astype(np.float64)
+    n = np.rint((n + 1) / 2 * (levels - 1))
+    return np.clip(n, 0, levels - 1).astype(np.uint8)
+
+
+def path_lut(rgb, wear_levels=WEAR_LEVELS, noise_levels=NOISE_LEVELS):
+    # Path shading as tables: add[w, n] + keep[w] * color.
+    light = (np.linspace(-1, 1, noise_levels) + 8) / 8
+    alpha = np.linspace(0, 1, wear_levels)
+    alpha = np.where(alpha > 0.95, 0.98, np.where(alpha > 0.05, alpha, 0.))
+    add = alpha[:, None, None] * shade(rgb, light)[None, :, :]
+    return add.astype(np.float32), (1 - alpha).astype(np.float32)
+
+
+def wear_levels(path, levels=WEAR_LEVELS):
+    return (np.clip(path, 0, 1) * (levels - 1) + 0.5).astype(np.intp)
+
+
+class Texture:
+    # A static texture over a whole map, made tile by tile when first read.
+
+    def __init__(self, fn, size=64, origin=0):
+        self.fn = fn
+        self.size = size
+        self.origin = origin
+        self.tiles = {}
+
+    def tile(self, tx, ty):
+        t = self.tiles.get((tx, ty))
+        if t is None:
+            s = self.size
+            t = self.tiles[tx, ty] = self.fn(
+                tx * s - self.origin, ty * s - self.origin, s, s
+            )
+        return t
+
+    def region(self, x, y, width, height):
+        s = self.size
+        out = None
+        for tx in range(x // s, (x + width - 1) // s + 1):
+            for ty in range(y // s, (y + height - 1) // s + 1):
+                t = self.tile(tx, ty)
+                if out is None:
+                    out = np.empty((width, height), dtype=t.dtype)
+                ax, ay = max(x, tx * s), max(y, ty * s)
+                bx = min(x + width, (tx + 1) * s)
+                by = min(y + height, (ty + 1) * s)
+                out[ax - x:bx - x, ay - y:by - y] = t[
+                    ax - tx * s:bx - tx * s, ay - ty * s:by - ty * s
+                ]
+        return out
+
+
+def tiles(width, height, size=TILE):
+    for x0 in range(0, width, size):
+        for y0 in range(0, height, size):
+            yield x0, y0, min(size, width - x0), min(size, height - y0)
+
+
+def run_tiles(fn, jobs, workers=None):
+    # fn(*job) for every job, in a process pool when worth it, in order.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        return [fn(*job) for job in jobs]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(fn, *zip(*jobs)))
+
+
+def pool_size(width, height, workers):
+    if width * height < PARALLEL_MIN:
+        return 1
+    return workers
+
+
+def heightmap(seed, width, height, workers=None):
+    hm = np.empty((width, height), dtype=np.float32)
+    parts = list(tiles(width, height))
+    jobs = [(seed, x0, y0, w, h) for x0, y0, w, h in parts]
+    workers = pool_size(width, height, workers)
+    for (x0, y0, w, h), tile in zip(parts, run_tiles(
+            heightmap_tile, jobs, workers)):
+        hm[x0:x0 + w, y0:y0 + h] = tile
+    return hm
+
+
+def surface(seed, grass_freq, hm, rippled, workers=None):
+    width, height = hm.shape
+    color = np.empty((width, height, 3), dtype=np.uint8)
+    blocked = np.empty((width, height), dtype=bool)
+    parts = list(tiles(width, height))
+    jobs = [
+        (seed, grass_freq, hm[x0:x0 + w, y0:y0 + h],
+         rippled[x0:x0 + w, y0:y0 + h], x0, y0)
+        for x0, y0, w, h in parts
+    ]
+    workers = pool_size(width, height, workers)
+    for (x0, y0, w, h), (c, b) in zip(parts, run_tiles(
+            surface_tile, jobs, workers)):
+        color[x0:x0 + w, y0:y0 + h] = c
+        blocked[x0:x0 + w, y0:y0 + h] = b
+    return color, blocked
+
+
+def chunk(seed, grass_freq, cx, cy, size, origin=0):
+    # Terrain of one chunk, sampled at cell - origin for precision.
+    x0, y0 = cx * size - origin, cy * size - origin
+    hm = heightmap_tile(seed, x0, y0, size, size)
+    rng = np.random.default_rng((seed, cx, cy))
+    rippled = rng.integers(0, 4, size=(size, size)) == 0
+    color, blocked = surface_tile(seed, grass_freq, hm, rippled, x0, y0)
+    return dict(heightmap=hm, blocked=blocked, color=color)
@@ -1,5 +1,31 @@
+import tempfile
+import types
 import unittest
 
+import numpy as np
+
+from grid import (
+    CHUNK, ActiveCells, ChunkedGrid, FoodIndex, GridStore, decay
+)
+from world import Trail, World
+from functions import tiles_in_front, turn
+from directions import FRONT, OFFSETS, REVERSE
+from fields import bfs, dijkstra
+from population import AntPopulation
+from rng import RandomStream
+from river import NodeGrid
+from astarpf import AStar, PathCache, slope_cost
+import noise
+import terrain
+from cache import WorldCache
+from schedule import Scheduler
+from pipeline import Snapshot, SnapshotBuffer
+try:
+    import main
+except ImportError:
+    # The window's tests need tdl.
+    main = None
+
 
 tcase = unittest.TestCase
 
@@ -9,5 +35,736 @@ class TestBare(tcase):
     def test(self):
         self.assertTrue(True)
 
+
+class TestGridStore(tcase):
+
+    def test_layers(self):
+        g = GridStore(4, 3)
+        self.assertEqual(g.pher.shape, (4, 3))
+        self.assertEqual(g.color.shape, (4, 3, 3))
+        self.assertEqual(g.pher.dtype.name, "float32")
+        self.assertEqual(g.color.dtype.name, "uint8")
+        self.assertFalse(g.food[3, 2])
+        self.assertIsInstance(g.food_index, FoodIndex)
+
+    def test_legacy_access(self):
+        g = GridStore(4, 3)
+        g["pher_grid"][2][1] = 0.5
+        self.assertAlmostEqual(g.pher[2, 1], 0.5)
+        self.assertIs(g["heightmap"], g.heightmap)
+
+
+class TestScatter(tcase):
+
+    def test_deposit_many_matches_sequential(self):
+        g = GridStore(5, 5)
+        g.pher[1, 1] = 0.9
+        xs = np.array([1, 1, 1, 2, 4])
+        ys = np.array([1, 1, 1, 3, 0])
+        g.deposit_many("pher", xs, ys, 0.05, 1.)
+        self.assertAlmostEqual(g.pher[1, 1], 1.)
+        self.assertAlmostEqual(g.pher[2, 3], 0.05)
+        self.assertAlmostEqual(g.pher[4, 0], 0.05)
+
+    def test_wear_many_stops_below_cap(self):
+        g = GridStore(5, 5)
+        g.path[0, 0] = 0.88
+        xs = np.array([0, 0, 0, 0, 3])
+        ys = np.array([0, 0, 0, 0, 3])
+        g.wear_many(xs, ys, 0.05)
+        self.assertAlmostEqual(g.path[0, 0], 0.98, places=5)
+        self.assertAlmostEqual(g.path[3, 3], 0.05)
+
+
+class TestTrail(tcase):
+
+    def test_keeps_newest_cells(self):
+        t = Trail(3)
+        for i in range(5):
+            t.append(i, 10 + i)
+        xs, ys = t.cells()
+        self.assertEqual(len(t), 3)
+        self.assertEqual(xs.tolist(), [2, 3, 4])
+        self.assertEqual(ys.tolist(), [12, 13, 14])
+        t.clear()
+        self.assertEqual(len(t.cells()[0]), 0)
+
+
+class TestDirections(tcase):
+
+    def test_tables_match_tiles_in_front(self):
+        # The offsets the old if/elif ladder produced.
+        expected = {
+            (1, 0): ((1, -1), (1, 1)),
+            (0, 1): ((1, 1), (-1, 1)),
+            (-1, -1): ((-1, 0), (0, -1)),
+            (1, -1): ((0, -1), (1, 0)),
+        }
+        for d, (left, right) in expected.items():
+            self.assertEqual(tiles_in_front(d), (left, d, right))
+            l, f, r = FRONT[OFFSETS.index(d)]
+            self.assertEqual((OFFSETS[l], OFFSETS[r]), (left, right))
+        self.assertEqual(turn((0, 1), "left"), (1, 1))
+
+    def test_reverse(self):
+        for i, (dx, dy) in enumerate(OFFSETS):
+            self.assertEqual(OFFSETS[REVERSE[i]], (-dx, -dy))
+
+
+class TestBFS(tcase):
+
+    def test_multi_source_owner_and_walls(self):
+        blocked = np.zeros((7, 3), dtype=bool)
+        blocked[3, :2] = True
+        dist, owner = bfs(blocked, [(0, 0, 0), (6, 0, 1)])
+        self.assertEqual(dist[2, 0], 2)
+        self.assertEqual(owner[2, 0], 0)
+        self.assertEqual(owner[5, 1], 1)
+        # The wall is never entered.
+        self.assertEqual(dist[3, 0], -1)
+        self.assertEqual(dist[3, 2], 3)
+
+    def test_limit(self):
+        dist, owner = bfs(np.zeros((10, 1), dtype=bool), [(0, 0, 0)], 3)
+        self.assertEqual(dist[3, 0], 3)
+        self.assertEqual(dist[4, 0], -1)
+
+
+class TestDijkstra(tcase):
+
+    def test_slope_and_walls(self):
+        blocked = np.zeros((5, 3), dtype=bool)
+        blocked[2, :2] = True
+        hm = np.zeros((5, 3), dtype=np.float32)
+        hm[4, 0] = .5
+        cost = dijkstra(blocked, hm, [(0, 0)], slope=2.)
+        self.assertAlmostEqual(cost[1, 1], 2 ** .5, places=6)
+        # Around the wall through (2, 2), then a climb of .5.
+        self.assertAlmostEqual(cost[3, 1], 3 * 2 ** .5, places=5)
+        self.assertAlmostEqual(cost[4, 0], 4 * 2 ** .5 + 1, places=5)
+        self.assertEqual(cost[2, 0], np.inf)
+
+    def test_colony_flow_leads_home(self):
+        world = World(60, 60, seed=8)
+        world.spawn_colony(*world.find_open_cell(30, 30))
+        colony = world.colonies[0]
+        flow = colony.flow
+        self.assertEqual(flow.cost_at(colony.x, colony.y), 0.)
+        # Start from the reachable cell farthest from the hill.
+        far = np.where(np.isfinite(flow.cost), flow.cost, -1.)
+        x, y = np.unravel_index(np.argmax(far), far.shape)
+        x, y = int(x) + flow.origin[0], int(y) + flow.origin[1]
+        # Following the steepest descent reaches the hill, walking only
+        # on open cells and always downhill.
+        for i in range(200):
+            if world.colony_field.colony_at(x, y) is colony:
+                break
+            cells = [(x + dx, y + dy) for dx, dy in OFFSETS]
+            gain = flow.downhill(x, y, cells)
+            self.assertGreater(max(gain), 0.)
+            x, y = cells[gain.index(max(gain))]
+            self.assertFalse(world.grid.blocked[x, y])
+        self.assertIs(world.colony_field.colony_at(x, y), colony)
+
+    def test_wall_repair_matches_rebuild(self):
+        world = World(60, 60, seed=3)
+        world.spawn_colony(*world.find_open_cell(30, 30))
+        world.spawn_colony(*world.find_open_cell(40, 20))
+        colony = world.colonies[0]
+        colony.flow.update()
+        world.colony_field.update()
+        walls = [world.find_open_cell(36, y) for y in range(20, 34)]
+        for cells in (walls, walls[::2]):
+            for x, y in cells:
+                world.build_wall(x, y)
+            cost = colony.flow.cost.copy()
+            home = world.colony_field.home.copy()
+            colony.flow.rebuild()
+            world.colony_field.rebuild()
+            np.testing.assert_allclose(cost, colony.flow.cost, atol=1e-3)
+            np.testing.assert_array_equal(home, world.colony_field.home)
+
+
+class TestAntPopulation(tcase):
+
+    def test_remove_keeps_survivors(self):
+        colony = types.SimpleNamespace(
+            world=None, x=0, y=0, rng=RandomStream(1)
+        )
+        pop = AntPopulation(colony, capacity=2)
+        pop.spawn(7)
+        pop.x[:7] = np.arange(7)
+        pop.trail[:7, 0] = np.arange(7)
+        pop.remove(np.array([1, 5, 6]))
+        self.assertEqual(len(pop), 4)
+        self.assertEqual(sorted(pop.x[:4].tolist()), [0, 2, 3, 4])
+        # Trails move with their ants.
+        np.testing.assert_array_equal(pop.trail[:4, 0], pop.x[:4])
+
+    def test_step_picks_up_delivers_and_starves(self):
+        world = World(60, 60, seed=3, vectorized=True)
+        world.spawn_colony(*world.find_open_cell(30, 30))
+        colony = world.colonies[0]
+        fx, fy = world.find_open_cell(10, 10)
+        world.spawn_food(fx, fy)
+        pop = colony.ants
+        pop.spawn(3)
+        # A searcher on food, a carrier on the hill and a starving ant.
+        pop.x[0], pop.y[0] = fx, fy
+        pop.energy[0] = 400
+        pop.mode[1], pop.food[1] = 1, 2
+        pop.energy[2] = 1
+        stored = colony.food
+        pop.step()
+        self.assertEqual(len(pop), 2)
+        self.assertEqual((pop.x[0], pop.y[0]), (fx, fy))
+        self.assertEqual((pop.food[0], pop.energy[0]), (1, 449))
+        source = world.grid.food_index.get(fx, fy)
+        self.assertEqual(source.amount, 499)
+        self.assertIs(type(source.amount), int)
+        self.assertEqual(colony.food, stored + 2)
+        self.assertEqual((pop.mode[1], pop.food[1]), (0, 0))
+        self.assertEqual(pop.energy[1], pop.max_energy - 1)
+
+
+class TestColony(tcase):
+
+    def test_dead_ants_swap_removed_and_reused(self):
+        world = World(60, 60, seed=3)
+        world.spawn_colony(*world.find_open_cell(30, 30))
+        colony = world.colonies[0]
+        colony.spawn_ants(6, debug=True)
+        ants = list(colony.ants)
+        # The last ant dies too, so it is both swapped in and removed.
+        dead = [ants[i] for i in (1, 3, 5)]
+        for a in dead:
+            a.energy = 0
+        survivors = [a for a in ants if a not in dead]
+        energy = [a.energy for a in survivors]
+        colony.update()
+        # Every survivor was updated exactly once.
+        self.assertEqual(
+            [a.energy for a in survivors], [e - 1 for e in energy]
+        )
+        # The spawn this tick reused a dead ant.
+        self.assertEqual(len(colony.ants), 4)
+        self.assertEqual(set(colony.ants[:3]), set(survivors))
+        self.assertIn(colony.ants[3], dead)
+        self.assertTrue(colony.ants[3].alive)
+        self.assertEqual(len(colony.pool), 2)
+        self.assertEqual(
+            [a.slot for a in colony.ants], list(range(len(colony.ants)))
+        )
+
+
+class TestFoodIndex(tcase):
+
+    class Source:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    def test_add_remove_mirrors_mask(self):
+        g = GridStore(10, 10)
+        a, b = self.Source(1, 2), self.Source(8, 8)
+        g.food_index.add(a)
+        g.food_index.add(b)
+        self.assertTrue(g.food[1, 2])
+        self.assertIs(g.food_index.get(8, 8), b)
+        self.assertEqual(list(g.food_index.in_rect(0, 0, 5, 5)), [a])
+        g.food_index.remove(a)
+        self.assertFalse(g.food[1, 2])
+        self.assertEqual(len(g.food_index), 1)
+        self.assertIsNone(a.index)
+
+
+class TestDecay(tcase):
+
+    def test_subtract_and_clamp(self):
+        f = np.array([[0., 0.003, 0.005, 0.5]], dtype=np.float32)
+        decay(f, 0.005)
+        np.testing.assert_allclose(f, [[0., 0., 0., 0.495]], rtol=1e-6)
+
+    def test_active_cells_match_dense(self):
+        dense = np.zeros((20, 30), dtype=np.float32)
+        dense[3, 4] = 0.012
+        dense[19, 29] = 0.5
+        sparse = dense.copy()
+        active = ActiveCells(sparse)
+        sparse[7, 1] = 0.02
+        active.add(7, 1)
+        dense[7, 1] = 0.02
+        for i in range(4):
+            decay(dense, 0.005)
+            active.decay(0.005)
+            np.testing.assert_array_equal(sparse, dense)
+        # Cells that reached zero dropped out of the active set.
+        self.assertEqual(len(active), 1)
+        self.assertFalse(active.member[3 * 30 + 4])
+
+
+class TestRandomStream(tcase):
+
+    def test_reproducible(self):
+        a, b = RandomStream(42, block=16), RandomStream(42, block=16)
+        draws = [a.randint(0, 9) for i in range(50)]
+        self.assertEqual(draws, [b.randint(0, 9) for i in range(50)])
+        self.assertTrue(all(0 <= d <= 9 for d in draws))
+
+    def test_spawned_streams(self):
+        root = RandomStream(42)
+        c1, c2 = root.spawn(), root.spawn()
+        first = [c1.random() for i in range(5)]
+        second = [c2.random() for i in range(5)]
+        self.assertNotEqual(first, second)
+        # Children are numbered in spawn order, so they can be recreated.
+        again = RandomStream(42)
+        again.spawn()
+        self.assertEqual(again.spawn().random(), second[0])
+
+
+class TestTerrain(tcase):
+
+    def test_noise_matches_noise_package(self):
+        xs = np.linspace(-3.7, 40.2, 23, dtype=np.float32)
+        ys = np.linspace(0.1, 61.9, 17, dtype=np.float32)
+        p = terrain.pnoise3(xs[:, None], ys[None, :], 42, octaves=2)
+        s = terrain.snoise2(xs[:, None], ys[None, :])
+        for i, x in enumerate(xs.tolist()):
+            for j, y in enumerate(ys.tolist()):
+                self.assertEqual(p[i, j], np.float32(
+                    noise.pnoise3(x, y, 42, octaves=2)
+                ))
+                self.assertEqual(s[i, j], np.float32(noise.snoise2(x, y)))
+
+    def test_carve_river(self):
+        hm = np.full((12, 12), 2., dtype=np.float32)
+        hm[5, 5] = -1.
+        terrain.carve_river(hm, np.array([[0, 0], [3, 3], [4, 3]]))
+        self.assertEqual(hm[3, 3], 0.)
+        # Next to two river cells, and diagonal to one at 1 and 2 cells.
+        self.assertAlmostEqual(hm[3, 4], 2. * 0.6 * 0.6, places=6)
+        self.assertAlmostEqual(hm[1, 1], 2. * 0.6 * 0.8, places=6)
+        self.assertEqual(hm[5, 5], -1.)
+        # Nothing wraps around to the far edges.
+        self.assertEqual(hm[11, 11], 2.)
+        self.assertEqual(hm[0, 11], 2.)
+
+    def test_tiles_cover_map(self):
+        hm = terrain.heightmap(3, 300, 270)
+        tile = terrain.heightmap_tile(3, 256, 0, 44, 270)
+        np.testing.assert_array_equal(hm[256:], tile)
+
+    def test_path_noise_texture_and_lut(self):
+        tex = terrain.Texture(terrain.path_noise, size=16, origin=5)
+        np.testing.assert_array_equal(
+            tex.region(-20, 3, 40, 30), terrain.path_noise(-25, -2, 40, 30)
+        )
+        add, keep = terrain.path_lut((100, 85, 50))
+        old = np.array([[20, 200, 90]], dtype=np.uint8)
+        for wear, n in ((0., 0.), (0.5, -1.), (1., 0.5)):
+            level = terrain.wear_levels(np.array(wear))
+            j = int(round((n + 1) / 2 * (terrain.NOISE_LEVELS - 1)))
+            got = (add[level, j] + keep[level] * old[0]).astype(np.uint8)
+            alpha = 0.98 if wear > 0.95 else wear
+            want = terrain.blend(
+                old, terrain.shade((100, 85, 50), (n + 8) / 8), alpha
+            )
+            # Within a quantization step of the unquantized shading.
+            np.testing.assert_allclose(got, want[0], atol=2)
+
+
+class TestWorldCache(tcase):
+
+    def test_cached_world_matches_generated(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = WorldCache(root)
+            first = World(120, 100, seed=42, cache=cache)
+            first.build_wall(*first.find_open_cell(60, 50))
+            again = World(120, 100, seed=42, cache=cache)
+            plain = World(120, 100, seed=42)
+        for name in ("heightmap", "blocked", "color"):
+            np.testing.assert_array_equal(
+                again.grid[name], plain.grid[name]
+            )
+        np.testing.assert_array_equal(again.river, plain.river)
+        self.assertIsNone(cache.load(42, 120, 100, 0))
+
+
+class TestChunkedGrid(tcase):
+
+    @staticmethod
+    def flat_chunk(cx, cy):
+        blocked = np.zeros((CHUNK, CHUNK), dtype=bool)
+        blocked[0, 0] = True
+        return dict(
+            blocked=blocked,
+            heightmap=np.full((CHUNK, CHUNK), cx + cy / 10., np.float32),
+            color=np.zeros((CHUNK, CHUNK, 3), dtype=np.uint8)
+        )
+
+    def test_layers_across_chunks(self):
+        g = ChunkedGrid(self.flat_chunk)
+        xs = np.array([CHUNK - 1, CHUNK, 3 * CHUNK + 5])
+        ys = np.array([0, 2 * CHUNK, 7])
+        np.testing.assert_allclose(g.heightmap[xs, ys], [0., 1.2, 3.])
+        self.assertEqual(g.pher[5, 5], 0.)
+        self.assertNotIn("pher", g.chunks[(0, 0)])
+        g.pher[xs, ys] = [0.1, 0.2, 0.3]
+        self.assertAlmostEqual(g.pher[CHUNK, 2 * CHUNK], 0.2)
+        self.assertTrue(g.blocked[CHUNK, 0])
+        with self.assertRaises(IndexError):
+            g.pher[-1, 0]
+
+    def test_deposit_and_decay_match_dense(self):
+        g = ChunkedGrid(self.flat_chunk)
+        dense = GridStore(3 * CHUNK, 3 * CHUNK)
+        rng = np.random.default_rng(3)
+        xs = rng.integers(CHUNK // 2, 2 * CHUNK, 500)
+        ys = rng.integers(0, 3 * CHUNK, 500)
+        for store in (g, dense):
+            store.deposit_many("pher", xs, ys, 0.05, 1.)
+            store.wear_many(xs, ys, 0.05)
+            store.decay_layer("pher", 0.01)
+        for name in ("pher", "path"):
+            np.testing.assert_array_equal(
+                g.region(name, 0, 0, 3 * CHUNK, 3 * CHUNK), dense[name]
+            )
+        for i in range(100):
+            g.decay_layer("pher", 0.01)
+        self.assertFalse(any("pher" in c for c in g.chunks.values()))
+
+    def test_find_open_cell_stays_near(self):
+        world = World(40, 40, seed=3, chunked=True)
+
+        def rock(cx, cy):
+            layers = world.make_chunk(cx, cy)
+            layers["blocked"][:] = True
+            return layers
+        world.grid.generate = rock
+        x, y = world.spawn_area[:2]
+        x, y = x + 100 * CHUNK, y + 100 * CHUNK
+        before = len(world.grid.chunks)
+        self.assertIsNone(world.find_open_cell(x, y))
+        # A window of 2 * CHUNK + 1 cells touches at most 6 x 6 chunks.
+        self.assertLessEqual(len(world.grid.chunks) - before, 36)
+
+
+class TestNodeGrid(tcase):
+
+    def test_nearest_matches_linear_scan(self):
+        rng = np.random.default_rng(5)
+        pts = [tuple(p) for p in rng.uniform(0, 500, (300, 2)).tolist()]
+        grid = NodeGrid(12.)
+        for p in pts:
+            grid.add(p)
+        for q in rng.uniform(-100, 600, (200, 2)).tolist():
+            best = min(pts, key=lambda p: (p[0] - q[0]) ** 2 +
+                       (p[1] - q[1]) ** 2)
+            self.assertEqual(grid.nearest(q), best)
+
+    def test_any_within(self):
+        grid = NodeGrid(10)
+        grid.add((50, 50))
+        self.assertTrue(grid.any_within((56, 58), 10))
+        self.assertFalse(grid.any_within((57, 58), 10))
+
+
+class TestAStar(tcase):
+
+    def test_shortest_path_around_wall(self):
+        blocked = np.zeros((7, 5), dtype=bool)
+        blocked[3, :4] = True
+        finder = AStar(blocked)
+        path = finder.find((0, 0), (6, 0))
+        self.assertEqual((path[0], path[-1]), ((0, 0), (6, 0)))
+        for (x, y), (nx, ny) in zip(path, path[1:]):
+            self.assertLessEqual(max(abs(nx - x), abs(ny - y)), 1)
+            self.assertFalse(blocked[nx, ny])
+        # Up to the gap at y == 4 and back down: three diagonals and one
+        # straight step each way.
+        self.assertAlmostEqual(finder.path_cost(path), 2 + 6 * 2 ** .5)
+
+    def test_unreachable_and_rebuilt_walls(self):
+        blocked = np.zeros((5, 5), dtype=bool)
+        finder = AStar(blocked)
+        self.assertIsNotNone(finder.find((0, 0), (4, 4)))
+        blocked[2, :] = True
+        self.assertIsNone(finder.find((0, 0), (4, 4)))
+
+    def test_slope_cost(self):
+        hm = np.zeros((5, 3))
+        hm[2, 1] = 10.
+        finder = AStar(np.zeros((5, 3), dtype=bool), slope_cost(hm))
+        path = finder.find((0, 1), (4, 1))
+        self.assertNotIn((2, 1), path)
+
+    def test_path_cache_drops_stale_paths(self):
+        blocked = np.zeros((9, 9), dtype=bool)
+        cache = PathCache(AStar(blocked))
+        path = cache.get((0, 4), (8, 4))
+        far = cache.get((0, 0), (1, 0))
+        blocked[4, 4] = True
+        cache.wall_changed(4, 4)
+        self.assertEqual(len(cache), 1)
+        self.assertNotIn((4, 4), cache.get((0, 4), (8, 4)))
+        blocked[4, 4] = False
+        cache.wall_changed(4, 4)
+        self.assertEqual(cache.get((0, 4), (8, 4)), path)
+        self.assertIs(cache.get((0, 0), (1, 0)), far)
+
+    def test_world_routes_repaired_by_walls(self):
+        world = World(60, 60, seed=8)
+        world.spawn_colony(*world.find_open_cell(30, 30))
+        colony = world.colonies[0]
+        cost = dijkstra(
+            world.grid.blocked, world.grid.heightmap, [(colony.x, colony.y)]
+        )
+        # The reachable cell farthest from the hill.
+        far = np.where(np.isfinite(cost), cost, -1.)
+        start = np.unravel_index(np.argmax(far), far.shape)
+        start = int(start[0]), int(start[1])
+        route = world.route_home(start)
+        other = (route[0], route[3])
+        near = world.find_path(*other)
+        x, y = route[len(route) // 2]
+        self.assertNotIn((x, y), near)
+        world.build_wall(x, y)
+        # Paths the wall doesn't touch stay cached.
+        self.assertIn(other, world.paths.paths)
+        self.assertIs(world.find_path(*other), near)
+        again = world.route_home(start)
+        self.assertNotIn((x, y), again)
+        self.assertEqual((again[0], again[-1]), (route[0], route[-1]))
+        for (ax, ay), (bx, by) in zip(again, again[1:]):
+            self.assertLessEqual(max(abs(bx - ax), abs(by - ay)), 1)
+            self.assertFalse(world.grid.blocked[bx, by])
+
+
+class StubConsole:
+    # Stands in for a tdl console, recording the cells drawn.
+
+    def __init__(self, width, height, arrays=False):
+        self.width, self.height = width, height
+        self.ch = np.full((width, height), ord(" "), dtype=np.int32)
+        self.fg = np.zeros((width, height, 3), dtype=np.uint8)
+        self.bg = np.zeros((width, height, 3), dtype=np.uint8)
+        self.drawn = []
+        if arrays:
+            self.tcod_console = types.SimpleNamespace(
+                ch=self.ch.T, fg=self.fg.transpose(1, 0, 2),
+                bg=self.bg.transpose(1, 0, 2), _order="C"
+            )
+
+    def draw_char(self, x, y, char, fg=None, bg=None):
+        self.drawn.append((x, y))
+        if char is not None:
+            self.ch[x, y] = ord(char) if isinstance(char, str) else char
+        if fg is not None:
+            self.fg[x, y] = fg
+        if bg is not None:
+            self.bg[x, y] = bg
+
+    def clear(self):
+        self.ch.fill(ord(" "))
+        self.fg.fill(0)
+        self.bg.fill(0)
+
+    def blit(self, src, *args, **kwargs):
+        self.ch[...], self.fg[...], self.bg[...] = src.ch, src.fg, src.bg
+
+
+@unittest.skipIf(main is None, "needs tdl")
+class TestWorldView(tcase):
+
+    @staticmethod
+    def make_view(world, arrays=False):
+        game = types.SimpleNamespace(
+            width=42, height=32, symbols=dict(
+                diag1=chr(227), diag2=chr(226),
+                horizontal=chr(229), vertical=chr(228)
+            )
+        )
+        view = main.WorldView(game, world)
+        view.console = StubConsole(view.width, view.height, arrays)
+        view.bulk = arrays
+        return view
+
+    @staticmethod
+    def render(view, world):
+        snap = Snapshot()
+        snap.capture(world, *view.area())
+        view.console.drawn = []
+        view.render(snap)
+        return set(view.console.drawn)
+
+    def assertSameFrame(self, a, b):
+        np.testing.assert_array_equal(a.ch, b.ch)
+        np.testing.assert_array_equal(a.bg, b.bg)
+        # Blank cells show no foreground.
+        shown = a.ch != ord(" ")
+        np.testing.assert_array_equal(a.fg[shown], b.fg[shown])
+
+    def test_redraws_only_changed_cells(self):
+        world = World(60, 60, seed=8)
+        world.spawn_colony(*world.find_open_cell(30, 30))
+        view = self.make_view(world)
+        self.render(view, world)
+        self.assertEqual(self.render(view, world), set())
+        x0, y0 = view.x, view.y
+        fx, fy = world.find_open_cell(x0 + 5, y0 + 5)
+        world.spawn_food(fx, fy)
+        self.assertEqual(self.render(view, world), {(fx - x0, fy - y0)})
+        # Wear shows once the paths are next recoloured.
+        px, py = world.find_open_cell(x0 + 20, y0 + 10)
+        world.grid.path[px, py] = 1.
+        self.assertEqual(self.render(view, world), set())
+        world.timer += view.fps
+        self.assertEqual(self.render(view, world), {(px - x0, py - y0)})
+        # A camera move redraws the whole view, the same as a new one.
+        view.camera.move(1, 0)
+        self.render(view, world)
+        fresh = self.make_view(world)
+        fresh.camera.move(1, 0)
+        self.render(fresh, world)
+        self.assertSameFrame(view.console, fresh.console)
+        self.assertEqual(self.render(view, world), set())
+
+    def test_blit_arrays_matches_draw_char(self):
+        rng = np.random.default_rng(1)
+        ch = rng.integers(32, 256, (6, 4))
+        fg = rng.integers(0, 256, (6, 4, 3)).astype(np.uint8)
+        bg = rng.integers(0, 256, (6, 4, 3)).astype(np.uint8)
+        cells, bulk = StubConsole(6, 4), StubConsole(6, 4, arrays=True)
+        for console in (cells, bulk):
+            main.blit_arrays(console, ch=ch, bg=bg)
+            main.blit_arrays(console, fg=fg)
+        self.assertEqual(len(cells.drawn), 2 * 6 * 4)
+        self.assertEqual(bulk.drawn, [])
+        for layer, want in (("ch", ch), ("fg", fg), ("bg", bg)):
+            np.testing.assert_array_equal(getattr(cells, layer), want)
+            np.testing.assert_array_equal(getattr(bulk, layer), want)
+
+    def test_bulk_view_matches_draw_char(self):
+        world = World(60, 60, seed=8)
+        world.spawn_colony(*world.find_open_cell(30, 30))
+        world.colonies[0].spawn_ants(20, debug=True)
+        world.build_wall(*world.find_open_cell(25, 25))
+        cells, bulk = self.make_view(world), self.make_view(world, True)
+        for i in range(4):
+            drawn = self.render(bulk, world)
+            self.render(cells, world)
+            self.assertSameFrame(bulk.console, cells.console)
+            # Only marks are drawn cell by cell.
+            self.assertLess(len(drawn), bulk.width * bulk.height // 4)
+            for j in range(bulk.fps):
+                world.update()
+
+
+@unittest.skipIf(main is None, "needs tdl")
+class TestInfoWindow(tcase):
+
+    def test_digits_and_heat_levels(self):
+        width, height = 7, 5
+        rng = np.random.default_rng(2)
+        layers = dict(
+            pher=(rng.random((width, height)) * 1.2).astype(np.float32),
+            heightmap=(rng.random((width, height)) * 12 - 1)
+            .astype(np.float32)
+        )
+        layers["pher"][0, :3] = (0., .1, .99)
+        snap = types.SimpleNamespace(origin=(0, 0), layers=layers)
+        for kind, name, scale in (
+            ("pher", "pher", 10), ("height", "heightmap", 1)
+        ):
+            view = types.SimpleNamespace(
+                window=StubConsole(width, height), bg=None
+            )
+            game = types.SimpleNamespace(view=view)
+            info = main.InfoWindow(game, width, height, type=kind)
+            info.console = game.active_window = StubConsole(width, height)
+            field = layers[name]
+            # As the window used to quantize, cell by cell.
+            digits = np.zeros((width, height), dtype=np.uint8)
+            for x in range(width):
+                for y in range(height):
+                    v = int(field[x, y] * scale)
+                    digits[x, y] = 9 if v >= 10 else max(v, 0)
+            info.update(snap)
+            np.testing.assert_array_equal(info.grid, digits)
+            np.testing.assert_array_equal(info.console.ch, digits + ord("0"))
+            info.toggle_heat()
+            info.update(snap)
+            levels = np.clip(
+                (field * (scale * 3.2)).astype(np.int64), 0, 31
+            )
+            np.testing.assert_array_equal(info.grid, levels)
+            np.testing.assert_array_equal(
+                info.console.bg, main.HEAT_RAMP[levels]
+            )
+
+
+class TestScheduler(tcase):
+
+    def make(self, tick_time=0., budget=1 / 16):
+        clock = [0.]
+
+        def tick():
+            clock[0] += tick_time
+
+        s = Scheduler(tick, rate=8., budget=budget, clock=lambda: clock[0])
+        return s, clock
+
+    def test_fixed_rate(self):
+        s, clock = self.make()
+        self.assertEqual(s.advance(), 0)
+        for dt, ran in ((0.3125, 2), (0.0625, 1), (0.0625, 0), (0.0625, 1)):
+            clock[0] += dt
+            self.assertEqual(s.advance(), ran)
+        self.assertEqual(s.ticks, 4)
+
+    def test_budget_and_fast_forward(self):
+        s, clock = self.make(tick_time=1 / 64)
+        s.advance()
+        clock[0] += 10.
+        # Only the budget's worth runs, and the rest is dropped.
+        self.assertEqual(s.advance(), 4)
+        self.assertEqual(s.advance(), 0)
+        s.fast = True
+        self.assertEqual(s.advance(), 4)
+        s.hold()
+        clock[0] += 10.
+        s.fast = False
+        self.assertEqual(s.advance(), 0)
+
+    def test_configured_budget(self):
+        for budget, ran in ((1 / 8, 8), (1 / 32, 2)):
+            s, clock = self.make(tick_time=1 / 64, budget=budget)
+            s.fast = True
+            self.assertEqual(s.advance(), ran)
+            self.assertAlmostEqual(clock[0], budget)
+
+
+class TestSnapshotBuffer(tcase):
+
+    def test_reader_keeps_its_snapshot(self):
+        world = World(40, 40, seed=3, vectorized=True)
+        world.spawn_colony(*world.find_open_cell(20, 20))
+        world.colonies[0].spawn_ants(5, debug=True)
+        buf = SnapshotBuffer()
+        buf.capture(world, 10, 10, 20, 20)
+        snap = buf.acquire()
+        self.assertEqual(snap.origin, (10, 10))
+        self.assertEqual(snap.layers["path"].shape, (20, 20))
+        self.assertEqual(len(snap.ants[0]), 5)
+        for i in range(3):
+            world.update()
+        # The writer fills the other slot while this one is drawn.
+        buf.capture(world, 10, 10, 20, 20)
+        self.assertEqual(snap.timer, 0)
+        self.assertIsNot(buf.front, snap)
+        self.assertEqual(buf.front.timer, 3)
+        buf.release()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,735 @@
+import random
+import numpy as np
+from functions import filled_circle
+from directions import (
+    FRONT, FRONT_OFFSETS, GLYPHS, INDEX, LEFT, OFFSETS, REVERSE, RIGHT
+)
+from river import NodeGrid, gen_river
+from grid import CHUNK, CHUNKED_SIZE, ChunkedGrid, GridStore
+from population import AntPopulation
+from fields import ColonyField, FlowField
+from rng import RandomStream
+from astarpf import AStar, PathCache, octile, slope_cost
+import terrain
+
+# Bump whenever a change alters the terrain generated for a seed, so
+# cached worlds from older code are not reused.
+GENERATOR_VERSION = 3
+# Extra walking cost per unit of height climbed or descended, for flow
+# fields and paths.
+SLOPE_COST = 10.
+
+
+class World:
+    def __init__(
+        self, width=200, height=200, seed=None, sparse=False,
+        vectorized=False, workers=None, cache=None, chunked=False
+    ):
+        self.seed = seed
+        self.sparse = sparse
+        self.vectorized = vectorized
+        self.workers = workers
+        self.cache = cache
+        self.chunked = chunked
+        self.timer = 0
+        # Where colonies and food get scattered at the start.
+        if chunked:
+            mid = CHUNKED_SIZE // 2
+            self.spawn_area = (
+                mid - width // 2, mid - height // 2, width, height
+            )
+            width = height = CHUNKED_SIZE
+        else:
+            self.spawn_area = (0, 0, width, height)
+        self.width, self.height = width, height
+        self.parameters = dict(
+            pher_evap_rate=0.005,
+            pher_amount_walk=0.05,
+            pher_amount_refill=0.50,
+            pher_sensitivity=5.,
+            terrain_awareness=1.,
+            max_pher=1.,
+            rand_dir_chance=10,
+            # How strongly homing ants follow their colony's flow field.
+            flow_weight=0.
+        )
+        self.colonies = []
+        self.generate_world(seed=seed)
+
+    # Old list-of-lists names, kept for code that indexes grid[x][y].
+    @property
+    def blocked_grid(self):
+        return self.grid.blocked
+
+    @property
+    def path_grid(self):
+        return self.grid.path
+
+    @property
+    def pher_grid(self):
+        return self.grid.pher
+
+    @property
+    def home_pher_grid(self):
+        return self.grid.home_pher
+
+    @property
+    def food_grid(self):
+        return self.grid.food
+
+    @property
+    def heightmap(self):
+        return self.grid.heightmap
+
+    @property
+    def color_array(self):
+        return self.grid.color
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get_pher_evap_rate(self):
+        return self.parameters["pher_evap_rate"]
+
+    def get_pher_refill_amnt(self):
+        return self.parameters["pher_amount_refill"]
+
+    def get_pher_walk_amnt(self):
+        return self.parameters["pher_amount_walk"]
+
+    def get_pher_sensitivity(self):
+        return self.parameters["pher_sensitivity"]
+
+    def get_flow_weight(self):
+        return self.parameters["flow_weight"]
+
+    def change_pher_evap_rate(self, change=0, value=0):
+        if change:
+            self.parameters["pher_evap_rate"] += change
+        elif value:
+            self.parameters["pher_evap_rate"] = value
+
+    def change_pher_refill_amnt(self, change=0, value=0):
+        if change:
+            self.parameters["pher_amount_refill"] += change
+        elif value:
+            self.parameters["pher_amount_refill"] = value
+
+    def change_pher_walk_amnt(self, change=0, value=0):
+        if change:
+            self.parameters["pher_amount_walk"] += change
+        elif value:
+            self.parameters["pher_amount_walk"] = value
+
+    def change_pher_sensitivity(self, change=0, value=0):
+        if change:
+            self.parameters["pher_sensitivity"] += change
+        elif value:
+            self.parameters["pher_sensitivity"] = value
+
+    def change_flow_weight(self, change=0, value=0):
+        if change:
+            self.parameters["flow_weight"] += change
+        elif value:
+            self.parameters["flow_weight"] = value
+
+    def find_open_cell(self, x, y, reach=4096):
+        # Nearest walkable cell to (x, y) within `reach`, or None. Looks
+        # in a growing window, done once the nearest cell found is closer
+        # than any cell outside it could be.
+        if self.chunked:
+            # The map has no edge to stop at, so stay within a few chunks.
+            reach = min(reach, 2 * CHUNK)
+        r = 16
+        while True:
+            x0, y0 = x - r, y - r
+            blocked = self.grid.region(
+                "blocked", x0, y0, 2 * r + 1, 2 * r + 1, fill=True
+            )
+            xs, ys = np.nonzero(~blocked)
+            if len(xs):
+                d = (xs - r) ** 2 + (ys - r) ** 2
+                i = np.argmin(d)
+                if d[i] <= r * r:
+                    return int(xs[i] + x0), int(ys[i] + y0)
+            covers = (
+                x0 <= 0 and y0 <= 0 and
+                x + r >= self.width - 1 and y + r >= self.height - 1
+            )
+            if covers or r >= reach:
+                if len(xs):
+                    return int(xs[i] + x0), int(ys[i] + y0)
+                return None
+            r *= 2
+
+    def spawn_colony(self, x=30, y=30):
+        self.colonies.append(Colony(self, x=x, y=y))
+        self.colony_field.invalidate()
+
+    def build_wall(self, x, y):
+        if (x, y) in self.walls:
+            self.walls.remove((x, y))
+            self.grid.blocked[x, y] = False
+        elif self.grid.blocked[x, y]:
+            pass
+        else:
+            self.walls.add((x, y))
+            self.grid.blocked[x, y] = True
+        self.colony_field.wall_changed(x, y)
+        for c in self.colonies:
+            c.flow.wall_changed(x, y)
+        if self.paths is not None:
+            self.paths.wall_changed(x, y)
+
+    def find_path(self, start, goal):
+        # Cached A* path between two cells, or None. Dense maps only.
+        if self.chunked:
+            return None
+        if self.paths is None:
+            self.paths = PathCache(AStar(
+                self.grid.blocked,
+                slope_cost(self.grid.heightmap, SLOPE_COST)
+            ))
+        return self.paths.get(start, goal)
+
+    def route_home(self, start):
+        # Cached path from a cell to the nearest colony's hill, or None.
+        if not self.colonies:
+            return None
+        x, y = start
+        c = min(self.colonies, key=lambda c: octile(c.x - x, c.y - y))
+        return self.find_path(start, (c.x, c.y))
+
+    def generate_world(self, seed=None):
+        if seed is None:
+            seed = random.Random().randint(1, 99999)
+        self.seed = seed
+        self.rng = RandomStream(seed)
+        self.timer = 0
+        self.walls = set()
+        if self.chunked:
+            # Terrain is made chunk by chunk as it is first needed.
+            self.grid = ChunkedGrid(self.make_chunk)
+            self.grass_freq = 4.0 * self.rng.uniform(0.5, 0.8)
+            self.river = np.empty((0, 2), dtype=np.int32)
+        else:
+            self.grid = GridStore(
+                self.width, self.height, sparse=self.sparse
+            )
+            if not self.load_terrain():
+                self.make_heightmap()
+                self.make_river()
+                self.make_surface()
+                self.save_terrain()
+        # Static noise the view shades worn paths with.
+        self.path_noise = terrain.Texture(
+            terrain.path_noise, CHUNK, self.width // 2 if self.chunked else 0
+        )
+        self.make_path()
+        self.colonies = []
+        self.colony_field = ColonyField(self)
+        self.paths = None
+        # Cell the window shows a route home from, if any.
+        self.route_start = None
+        # self.spawn_colony(x=self.width // 2, y=self.height // 2)
+
+    def make_chunk(self, cx, cy):
+        return terrain.chunk(
+            self.seed, self.grass_freq, cx, cy, CHUNK, self.width // 2
+        )
+
+    def load_terrain(self):
+        if self.cache is None:
+            return False
+        layers = self.cache.load(
+            self.seed, self.width, self.height, GENERATOR_VERSION
+        )
+        if layers is None:
+            return False
+        self.grid.heightmap = layers["heightmap"]
+        self.grid.blocked = layers["blocked"]
+        self.grid.color = layers["color"]
+        self.river = layers["river"]
+        return True
+
+    def save_terrain(self):
+        if self.cache is None:
+            return
+        self.cache.save(
+            self.seed, self.width, self.height, GENERATOR_VERSION,
+            dict(
+                heightmap=self.grid.heightmap, blocked=self.grid.blocked,
+                color=self.grid.color, river=self.river
+            )
+        )
+
+    def make_heightmap(self):
+        self.grid.heightmap[:] = terrain.heightmap(
+            self.seed, self.width, self.height, self.workers
+        )
+
+    def make_surface(self):
+        # Grass, puddles and rocks, colored and blocked from the heightmap.
+        octaves = self.rng.uniform(0.5, 0.8)
+        freq = 4.0 * octaves
+        # One in four rock cells gets a rippled shade.
+        rippled = self.rng.generator.integers(
+            0, 4, size=(self.width, self.height)
+        ) == 0
+        color, blocked = terrain.surface(
+            self.seed, freq, self.grid.heightmap, rippled, self.workers
+        )
+        self.grid.color[:] = color
+        self.grid.blocked[:] = blocked
+
+    def spawn_food(self, x, y):
+        if not self.grid.blocked[x, y] and not self.grid.food[x, y]:
+            self.grid.food_index.add(Food(x, y))
+
+    # def get_pf_cost(self, origin, next):
+    #     h1 = self.heightmap[origin[0]][origin[1]]
+    #     # print(next)
+    #     h2 = self.heightmap[next[0]][next[1]]
+    #     # return abs(h1 - h2) * 10
+    #     return int(h2 / 2)
+
+    def make_river(self):
+        # Up to 25 low points, at least 10 cells apart and picked in
+        # random order, for the river to run through.
+        xs, ys = np.nonzero(self.grid.heightmap < 0.7)
+        spaced = NodeGrid(10)
+        target_nodes = []
+        for i in self.rng.generator.permutation(len(xs)).tolist():
+            c = int(xs[i]), int(ys[i])
+            if not spaced.any_within(c, 10):
+                spaced.add(c)
+                target_nodes.append(c)
+                if len(target_nodes) == 25:
+                    break
+        r = gen_river(
+            self.width, self.height, startnode=(32, 32), numnodes=100,
+            custom_nodes=target_nodes, rng=self.rng
+        )
+        self.river = np.array(sorted(r), dtype=np.int32).reshape(-1, 2)
+        terrain.carve_river(self.grid.heightmap, self.river)
+
+    def make_path(self):
+        self.grid.decay_layer("path", 0.015)
+
+    def evaporate(self):
+        rate = self.parameters["pher_evap_rate"]
+        self.grid.decay_layer("pher", rate)
+        self.grid.decay_layer("home_pher", rate)
+
+    def wear_path(self, x, y):
+        wear = 0.05
+        if (
+            not self.grid.path[x, y] >= 1. and
+            not self.grid.path[x, y] + wear > 1.
+        ):
+            self.grid.path[x, y] += wear
+            self.grid.mark("path", x, y)
+
+    def search_pheromone(self, pos, amount):
+        x, y = pos
+        t = self.grid.pher[x, y]
+        if t + amount <= self.parameters["max_pher"]:
+            self.grid.pher[x, y] += amount
+        else:
+            self.grid.pher[x, y] = self.parameters["max_pher"]
+        self.grid.mark("pher", x, y)
+
+    def home_pheromone(self, pos, amount):
+        x, y = pos
+        t = self.grid.home_pher[x, y]
+        if t + amount <= self.parameters["max_pher"]:
+            self.grid.home_pher[x, y] += amount
+        else:
+            self.grid.home_pher[x, y] = self.parameters["max_pher"]
+        self.grid.mark("home_pher", x, y)
+
+    def wear_paths(self, xs, ys):
+        self.grid.wear_many(xs, ys, 0.05)
+
+    def search_pheromones(self, xs, ys, amount):
+        self.grid.deposit_many(
+            "pher", xs, ys, amount, self.parameters["max_pher"]
+        )
+
+    def home_pheromones(self, xs, ys, amount):
+        self.grid.deposit_many(
+            "home_pher", xs, ys, amount, self.parameters["max_pher"]
+        )
+
+    def update(self):
+        self.timer += 1
+        if not self.timer % 5:
+            self.make_path()
+        if not self.timer % 3:
+            self.evaporate()
+        for c in self.colonies:
+            c.update()
+
+
+class Colony:
+
+    def __init__(self, world, x=10, y=10):
+        self.world = world
+        self.rng = world.rng.spawn()
+        self.x, self.y = x, y
+        self.size = 2
+        # self.points = circle(self.x, self.y, self.size)
+        self.generate_hill()
+        self.flow = FlowField(self, slope=SLOPE_COST)
+        self.spawn_cd = 10 - self.size
+        self.cd_timer = 0
+        self.vectorized = world.vectorized
+        if self.vectorized:
+            self.ants = AntPopulation(self)
+        else:
+            self.ants = []
+        # Ants that died this tick, and retired Ant objects to reuse.
+        self.dead = []
+        self.pool = []
+        self.max_capacity = 25 + 3 ** self.size
+        self.food = self.max_capacity * 2
+
+    def generate_hill(self):
+        self.base = filled_circle(self.x, self.y, radius=self.size)
+        self.mid = set()
+        self.top = set()
+        if self.size >= 3:
+            self.mid = filled_circle(self.x, self.y, radius=self.size - 2)
+        if self.size >= 5:
+            self.top = filled_circle(self.x, self.y, radius=self.size - 4)
+
+        to_del = []
+        for (x, y) in self.base:
+            try:
+                if self.world.grid.blocked[x, y]:
+                    to_del.append((x, y))
+            except IndexError:
+                to_del.append((x, y))
+        for p in to_del:
+            self.base.remove(p)
+            if p in self.mid:
+                self.mid.remove(p)
+            if p in self.top:
+                self.top.remove(p)
+
+    def spawn_ant(self, debug=False):
+        return self.spawn_ants(1, debug=debug)
+
+    def spawn_ants(self, n, debug=False):
+        if not debug:
+            n = min(n, max(self.food, 0))
+            self.food -= n
+        if n <= 0:
+            return 0
+        if self.vectorized:
+            self.ants.spawn(n)
+        else:
+            for i in range(n):
+                if self.pool:
+                    a = self.pool.pop()
+                    a.reset(self)
+                else:
+                    a = Ant(self)
+                a.slot = len(self.ants)
+                self.ants.append(a)
+        return n
+
+    def remove_dead(self):
+        # Swap-remove: the last ant takes the dead one's slot.
+        for a in self.dead:
+            last = self.ants.pop()
+            if last is not a:
+                self.ants[a.slot] = last
+                last.slot = a.slot
+            self.pool.append(a)
+        self.dead = []
+
+    def change_size(self, newsize=None, grow=None, shrink=None):
+        if newsize:
+            self.size = newsize
+        elif grow:
+            self.size += grow
+        elif shrink:
+            self.size -= shrink
+        self.generate_hill()
+        self.max_capacity = 25 + 3 ** self.size
+        self.spawn_cd = 10 - self.size
+        if self.spawn_cd < 0:
+            self.spawn_cd = 0
+        if self.size <= 0:
+            self.world.colonies.remove(self)
+        self.world.colony_field.invalidate()
+        self.flow.invalidate()
+
+    def update(self):
+        if self.vectorized:
+            self.ants.step()
+        else:
+            for a in self.ants:
+                a.update()
+            self.remove_dead()
+        if self.cd_timer <= 0:
+            if len(self.ants) < self.max_capacity:
+                self.spawn_ant()
+                self.cd_timer = self.spawn_cd
+        else:
+            self.cd_timer -= 1
+
+        if (
+            len(self.ants) >= self.max_capacity and
+            self.food >= (25 + 3 ** (self.size + 1)) * 2
+        ):
+            self.change_size(grow=1)
+        elif (
+            len(self.ants) < 25 + 3 ** (self.size - 1) and
+            self.food <= 0
+        ):
+            self.change_size(shrink=1)
+
+
+class Trail:
+    # Ring buffer of the last `capacity` cells an ant walked over.
+
+    def __init__(self, capacity):
+        self.xs = np.zeros(capacity, dtype=np.int32)
+        self.ys = np.zeros(capacity, dtype=np.int32)
+        self.capacity = capacity
+        self.head, self.length = 0, 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, x, y):
+        self.xs[self.head] = x
+        self.ys[self.head] = y
+        self.head = (self.head + 1) % self.capacity
+        if self.length < self.capacity:
+            self.length += 1
+
+    def clear(self):
+        self.head, self.length = 0, 0
+
+    def cells(self):
+        # Oldest first.
+        start = (self.head - self.length) % self.capacity
+        i = (start + np.arange(self.length)) % self.capacity
+        return self.xs[i], self.ys[i]
+
+
+class Ant:
+
+    def __init__(self, colony):
+        self.max_energy = 600
+        self.capacity = 2
+        self.visited = Trail(self.max_energy // 2)
+        self.slot = 0
+        self.reset(colony)
+
+    def reset(self, colony):
+        self.colony = colony
+        self.x, self.y = colony.x, colony.y
+        self.dir = colony.rng.randrange(8)
+        self.mode = 0   # 0: search, 1: home
+        self.energy = self.max_energy
+        self.food = 0
+        self.alive = True
+        self.visited.clear()
+
+    @property
+    def direction(self):
+        return OFFSETS[self.dir]
+
+    def get_symbol(self, symbol):
+        return symbol[GLYPHS[self.dir]]
+
+    def move(self):
+        w = self.colony.world
+        self.choose_dir()
+        dx, dy = OFFSETS[self.dir]
+        x, y = self.x + dx, self.y + dy
+        if w.in_bounds(x, y):
+            if not w.grid.blocked[x, y]:
+                pher_amount = w.parameters[
+                    "pher_amount_walk"
+                ]
+                self.x, self.y = x, y
+                w.wear_path(x, y)
+                if not self.mode:
+                    w.search_pheromone((x, y), pher_amount)
+                elif self.mode == 1:
+                    w.home_pheromone((x, y), pher_amount)
+                self.visited.append(x, y)
+
+    def change_direction(self, d=None):
+        # Accepts a direction index or an (dx, dy) offset.
+        if isinstance(d, tuple):
+            d = INDEX[d]
+        self.dir = d
+
+    def choose_dir(self):
+        w = self.colony.world
+        grid = w.grid
+        width, height = grid.width, grid.height
+        hm, food = grid.heightmap, grid.food
+        ldir, fdir, rdir = FRONT[self.dir]
+
+        sensitivity = w.parameters["pher_sensitivity"]
+        # terrain_awareness = w.parameters["terrain_awareness"]
+        if self.mode == 0:
+            pher = grid.pher
+        elif self.mode == 1:
+            pher = grid.home_pher
+        cur_val = hm[self.x, self.y]
+
+        weights = [0., 0.1, 0.]
+        flow_weight = w.parameters["flow_weight"]
+        if self.mode == 1 and flow_weight:
+            downhill = self.colony.flow.downhill(
+                self.x, self.y, [
+                    (self.x + dx, self.y + dy)
+                    for dx, dy in FRONT_OFFSETS[self.dir]
+                ]
+            )
+            for i, d in enumerate(downhill):
+                weights[i] += flow_weight * d
+        for i, (dx, dy) in enumerate(FRONT_OFFSETS[self.dir]):
+            x, y = self.x + dx, self.y + dy
+            if not (0 <= x < width and 0 <= y < height):
+                weights[i] = 0
+                continue
+            # Heightmap weight
+            v = weights[i] + 1 - abs(cur_val - hm[x, y])
+            v += pher[x, y] * sensitivity
+            if not self.mode and food[x, y]:
+                v += 1
+            weights[i] = v
+
+        lw, fw, rw = weights
+        # fw = max(0.2, fw)
+        lw, fw, rw = max(0, lw), max(0, fw), max(0, rw)
+        # rand_chance = sum([lw, rw, fw]) / 3 / rand_dir_chance
+
+        # choices = [
+        #     ("left", lw),
+        #     ("right", rw),
+        #     ("forward", fw),
+        #     ("random", rand_chance)
+        # ]
+        # print(lw, fw, rw)
+        # print(rand_chance)
+        # c = weighted_choice(choices)
+        # print(c)
+        # # print(choices, c)
+        # if c == "left":
+        #     self.change_direction(ldir)
+        # elif c == "right":
+        #     self.change_direction(rdir)
+        # elif c == "forward":
+        #     pass
+        # elif c == "random":
+        #     self.change_direction(random.choice([rdir, ldir]))
+
+        rand_dir_chance = w.parameters["rand_dir_chance"]
+        rng = self.colony.rng
+        if rng.randbelow(rand_dir_chance + 1):
+            if lw > max([fw, rw]):
+                self.change_direction(ldir)
+            elif rw > max([fw, lw]):
+                self.change_direction(rdir)
+            else:
+                self.change_direction(fdir)
+        else:
+            self.change_direction(rng.choice((rdir, ldir)))
+
+    def deliver_food(self):
+        self.colony.food += self.food
+        self.refill_trail()
+        self.food = 0
+        self.mode = 0
+        self.visited.clear()
+
+    def refill_trail(self):
+        w = self.colony.world
+        pher_amount = w.parameters["pher_amount_refill"]
+        xs, ys = self.visited.cells()
+        if not len(xs):
+            return
+        w.home_pheromones(xs, ys, pher_amount)
+        if not self.mode:
+            w.search_pheromones(xs, ys, pher_amount)
+
+    def turn(self, d):
+        if d == "left":
+            self.dir = LEFT[self.dir]
+        elif d == "right":
+            self.dir = RIGHT[self.dir]
+
+    def die(self):
+        # Removed by Colony.remove_dead once the tick is over.
+        if self.alive:
+            self.alive = False
+            self.colony.dead.append(self)
+
+    def update(self):
+        if self.energy <= 0:
+            self.die()
+            return
+        turns = 1
+        if turns:
+            if not self.mode:
+                if self.energy <= self.max_energy // 2:
+                    self.mode = 1
+                    self.visited.clear()
+                if self.food < self.capacity:
+                    grid = self.colony.world.grid
+                    if grid.food[self.x, self.y]:
+                        f = grid.food_index.get(self.x, self.y).take()
+                        self.food += f
+                        turns -= 1
+                        self.energy += 50
+                else:
+                    self.refill_trail()
+                    self.visited.clear()
+                    self.dir = REVERSE[self.dir]
+                    self.mode = 1
+            elif self.mode == 1:
+                field = self.colony.world.colony_field
+                if field.colony_at(self.x, self.y) is not None:
+                    self.deliver_food()
+                    self.dir = REVERSE[self.dir]
+                    self.energy = self.max_energy
+
+        if self.energy:
+            self.energy -= 1
+
+        if turns:
+            self.move()
+
+
+class Food:
+
+    def __init__(self, x, y, amount=500):
+        self.x, self.y = x, y
+        self.amount = amount
+        self.index = None
+
+    def take(self, amount=1):
+        if self.amount > amount:
+            self.amount -= amount
+            return amount
+        a = self.amount
+        self.amount = 0
+        if self.index is not None:
+            self.index.remove(self)
+        return a
+
+    def check(self):
+        if self.amount <= 0:
+            return False
+        else:
+            return True